@@ -1,56 +1,49 @@
 import os
-import re
-import base64
-import datetime
-
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import json
+import time
+
 from googleapiclient.errors import HttpError
-from openpyxl import Workbook, load_workbook
+
+import google_clients
+import metrics
+import prospect_store
+import quota
+from jobs import log, progress
+from lead_parser import extract_body, extract_info
 
 # --- CONFIGURATION ---
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 LABEL_NAME = "Traité"
-EXCEL_FILE = "prospects.xlsx"
+
+# --- Requêtes groupées Gmail ---
+LIST_PAGE_SIZE = 500      # max autorisé par messages.list
+BATCH_SIZE = 50           # taille conseillée par Google pour une requête batch
+MODIFY_CHUNK_SIZE = 1000  # max d'ids acceptés par messages.batchModify
+
+# --- Synchronisation incrémentale (historyId) ---
+HISTORY_FILE = "gmail_history.json"
+RESYNC_MAX_MESSAGES = 500
 
 # --- Domaine interne à ignorer (ex : Google Calendar) ---
 INTERNAL_DOMAIN = "calendar.google.com"
 
+# Filtres poussés côté serveur (le filtrage local reste la référence)
+SERVER_FILTER = f"-from:{INTERNAL_DOMAIN} -subject:confirmation -subject:invitation"
+# Resynchro si pas de checkpoint : tous les non lus, bornée par RESYNC_MAX_MESSAGES (pas par date)
+RESYNC_QUERY = f"is:unread {SERVER_FILTER}"
+
 
 # ----------------------------------------------------------
-# 🔐 Connexion Gmail + Création auto de token.json
+# 🔐 Connexion Gmail (client partagé, token.json créé au besoin)
 # ----------------------------------------------------------
 def gmail_service():
-    creds = None
-
-    # Charger token.json s'il existe
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-
-    # Si pas de token → on le crée
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # ⚠️ Doit correspondre au credentials.json de ton nouveau projet
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-
-        # Sauvegarder token
-        with open('token.json', 'w', encoding="utf-8") as token:
-            token.write(creds.to_json())
-
-    return build('gmail', 'v1', credentials=creds)
+    return google_clients.get_service('gmail', 'v1', 'token.json', SCOPES)
 
 
 # --- Créer ou récupérer label ---
 def get_or_create_label(service, label_name):
     try:
-        labels = service.users().labels().list(userId='me').execute().get('labels', [])
+        labels = quota.execute(service.users().labels().list(userId='me')).get('labels', [])
         for label in labels:
             if label['name'] == label_name:
                 return label['id']
@@ -60,142 +53,320 @@ def get_or_create_label(service, label_name):
             'labelListVisibility': 'labelShow',
             'messageListVisibility': 'show'
         }
-        created_label = service.users().labels().create(userId='me', body=label).execute()
+        created_label = quota.execute(service.users().labels().create(userId='me', body=label))
         return created_label['id']
 
     except HttpError as error:
-        print(f"Erreur création label : {error}")
+        log(f"Erreur création label : {error}")
         return None
 
 
-# --- Extraire infos depuis le corps ---
-def extract_info(email_body):
-    info = {}
-    patterns = {
-        'Prénom': r'Prénom\s*[:=]?\s*(.*)',
-        'Nom': r'Nom\s*[:=]?\s*(.*)',
-        'Email': r'Email\s*[:=]?\s*(.*)',
-        'Téléphone': r'Téléphone\s*[:=]?\s*(.*)',
-        'Adresse': r'Adresse\s*[:=]?\s*(.*)',
-        'Ville': r'Ville\s*[:=]?\s*(.*)',
-        'Code postal': r'Code postal\s*[:=]?\s*(.*)',
-        'Département': r'Département\s*[:=]?\s*(.*)',
-        'Bien recherché': r'Bien recherché\s*[:=]?\s*(.*)',
-        'Budget': r"Budget d'achat\s*[:=]?\s*(.*)",
-        'Financement': r'A un dossier de financement\s*[:=]?\s*(.*)',
-        'Délai': r"Délai d'achat\s*[:=]?\s*(.*)",
-        'Secteurs': r'Secteurs de recherche\s*[:=]?\s*(.*)',
-        'Programme neuf': r'Est intéressé par du programme neuf\s*[:=]?\s*(.*)',
-        'Jours disponibles': r'Jours disponibles\s*[:=]?\s*(.*)',
-        'Plages horaires': r'Plages horaires\s*[:=]?\s*(.*)'
-    }
-
-    for key, pattern in patterns.items():
-        match = re.search(pattern, email_body, re.IGNORECASE)
-        info[key] = match.group(1).strip() if match else ''
+# --- Ajouter les prospects dans la base locale ---
+def save_prospects(info_list):
+    conn = prospect_store.connect()
+    try:
+        count = prospect_store.add_prospects(conn, info_list)
+    finally:
+        conn.close()
+    log(f"{count} prospects sauvegardés dans {prospect_store.DB_FILE}")
 
-    info['Date_Entree'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    return info
 
+# --- Lister tous les emails (avec pagination) ---
+def list_message_ids(service, query="is:unread", max_results=None):
+    msg_ids = []
+    page_token = None
 
-# --- Ajouter ou créer Excel ---
-def save_to_excel(info_list):
-    if os.path.exists(EXCEL_FILE):
-        wb = load_workbook(EXCEL_FILE)
-        ws = wb.active
-    else:
-        wb = Workbook()
-        ws = wb.active
-        ws.append(list(info_list[0].keys()))
+    while True:
+        page_size = LIST_PAGE_SIZE
+        if max_results is not None:
+            page_size = min(page_size, max_results - len(msg_ids))
 
-    for info in info_list:
-        ws.append(list(info.values()))
+        results = quota.execute(service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=page_size,
+            pageToken=page_token
+        ))
 
-    wb.save(EXCEL_FILE)
-    wb.close()
-    print(f"Données sauvegardées dans {EXCEL_FILE}")
+        msg_ids.extend(m['id'] for m in results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token or (max_results is not None and len(msg_ids) >= max_results):
+            return msg_ids
 
 
-# --- Marquer email traité ---
-def mark_email_processed(service, msg_id, label_id):
+# --- Checkpoint historyId (+ emails à re-télécharger au prochain passage) ---
+def _load_checkpoint():
+    if not os.path.exists(HISTORY_FILE):
+        return {}
     try:
-        service.users().messages().modify(
-            userId='me',
-            id=msg_id,
-            body={'addLabelIds': [label_id], 'removeLabelIds': ['UNREAD']}
-        ).execute()
-
-        print(f"Email {msg_id} traité et marqué comme '{LABEL_NAME}'.")
-
-    except HttpError as e:
-        print(f"Erreur traitement email {msg_id}: {e}")
+        with open(HISTORY_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_history_id():
+    return _load_checkpoint().get('historyId')
+
+
+def load_retry_ids():
+    return _load_checkpoint().get('retryIds', [])
+
+
+def save_history_id(history_id, retry_ids=()):
+    # Un email en échec n'apparaîtra plus dans history.list : on garde son id
+    tmp_file = HISTORY_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding="utf-8") as f:
+        json.dump({'historyId': str(history_id), 'retryIds': list(retry_ids)}, f)
+    os.replace(tmp_file, HISTORY_FILE)
+
+
+def get_current_history_id(service):
+    return quota.execute(service.users().getProfile(userId='me'))['historyId']
+
+
+# --- Nouveaux emails depuis le checkpoint : (ids, historyId) ---
+# Renvoie (None, None) si le checkpoint a expiré (HTTP 404).
+def list_new_message_ids(service, start_history_id):
+    msg_ids = []
+    seen = set()
+    page_token = None
+
+    while True:
+        try:
+            results = quota.execute(service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ))
+        except HttpError as error:
+            if error.resp.status == 404:
+                return None, None
+            raise
+
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                msg_id = added['message']['id']
+                if msg_id not in seen:
+                    seen.add(msg_id)
+                    msg_ids.append(msg_id)
+
+        history_id = results.get('historyId', start_history_id)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return msg_ids, history_id
+
+
+# --- Choisir entre synchro incrémentale et resynchro bornée ---
+def _with_retries(msg_ids, retry_ids):
+    if retry_ids:
+        log(f"{len(retry_ids)} emails en échec au dernier passage sont re-tentés")
+    merged = []
+    seen = set()
+    for msg_id in list(retry_ids) + msg_ids:
+        if msg_id not in seen:
+            seen.add(msg_id)
+            merged.append(msg_id)
+    return merged
+
+
+def sync_message_ids(service):
+    start_history_id = load_history_id()
+    retry_ids = load_retry_ids()
+
+    if start_history_id:
+        msg_ids, history_id = list_new_message_ids(service, start_history_id)
+        if msg_ids is not None:
+            log(f"{len(msg_ids)} nouveaux emails depuis le dernier passage...")
+            return _with_retries(msg_ids, retry_ids), history_id
+        log("Checkpoint Gmail expiré : resynchronisation complète.")
+
+    # historyId relevé AVANT le listing : aucun email ne peut passer entre les deux
+    history_id = get_current_history_id(service)
+    msg_ids = list_message_ids(service, query=RESYNC_QUERY, max_results=RESYNC_MAX_MESSAGES)
+    log(f"{len(msg_ids)} emails non lus à traiter...")
+    if len(msg_ids) >= RESYNC_MAX_MESSAGES:
+        # Liste du plus récent au plus ancien : les non lus au-delà de la borne ne seront pas repris
+        log(f"Limite de resynchronisation atteinte ({RESYNC_MAX_MESSAGES}) : "
+            f"les emails non lus plus anciens ne sont pas traités (augmenter RESYNC_MAX_MESSAGES)")
+    return _with_retries(msg_ids, retry_ids), history_id
+
+
+# --- Récupérer les emails par requêtes batch ---
+def fetch_messages(service, msg_ids, fmt='full', failures=None, metadata_headers=None):
+    messages = {}
+    retry_ids = []
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            messages[request_id] = response
+        elif quota.is_retryable(exception) and attempt < quota.MAX_RETRIES:
+            retry_ids.append(request_id)
+        else:
+            log(f"Erreur récupération email {request_id}: {exception}")
+            if failures is not None:
+                status = getattr(getattr(exception, 'resp', None), 'status', None)
+                failures.append({'id': request_id, 'error': str(exception), 'status': status})
+
+    for start in range(0, len(msg_ids), BATCH_SIZE):
+        pending = msg_ids[start:start + BATCH_SIZE]
+        attempt = 0
+
+        # Les sous-requêtes refusées (429, 5xx) sont rejouées dans un nouveau batch
+        while pending:
+            batch = service.new_batch_http_request(callback=callback)
+            for msg_id in pending:
+                params = {'userId': 'me', 'id': msg_id, 'format': fmt}
+                if metadata_headers:
+                    params['metadataHeaders'] = metadata_headers
+                batch.add(service.users().messages().get(**params), request_id=msg_id)
+            quota.execute(batch)
+
+            pending = retry_ids[:]
+            retry_ids.clear()
+            if pending:
+                time.sleep(quota.backoff_delay(attempt))
+                attempt += 1
+
+    # On conserve l'ordre de la liste Gmail
+    return [messages[msg_id] for msg_id in msg_ids if msg_id in messages]
+
+
+# --- Marquer emails traités (un batchModify par paquet) ---
+def mark_emails_processed(service, msg_ids, label_id):
+    add_labels = [label_id] if label_id else []
+    marked = 0
+
+    for start in range(0, len(msg_ids), MODIFY_CHUNK_SIZE):
+        chunk = msg_ids[start:start + MODIFY_CHUNK_SIZE]
+        try:
+            quota.execute(service.users().messages().batchModify(
+                userId='me',
+                body={
+                    'ids': chunk,
+                    'addLabelIds': add_labels,
+                    'removeLabelIds': ['UNREAD']
+                }
+            ))
+
+            marked += len(chunk)
+            log(f"{len(chunk)} emails traités et marqués comme '{LABEL_NAME}'.")
+
+        except HttpError as e:
+            log(f"Erreur traitement de {len(chunk)} emails : {e}")
+
+    return marked
+
+
+# --- Filtrer confirmations Google Calendar (en-têtes seulement) ---
+def is_lead(message):
+    headers = message['payload'].get('headers', [])
+    subject = ""
+    sender = ""
+
+    for h in headers:
+        if h['name'] == 'From':
+            sender = h['value']
+        if h['name'] == 'Subject':
+            subject = h['value']
+
+    return not (("confirmation" in subject.lower()) or
+                ("invitation" in subject.lower()) or
+                (INTERNAL_DOMAIN in sender.lower()))
+
+
+# --- Extraire les infos d'un email prospect ---
+def parse_message(message):
+    email_body, part = extract_body(message['payload'])
+
+    if part is None:
+        log(f"Email {message['id']} : aucune partie texte trouvée")
+    elif part.get('mimeType') == 'text/html':
+        log(f"Email {message['id']} : corps lu depuis la partie HTML {part.get('partId', '')}")
+
+    return extract_info(email_body)
 
 
 # ------------------------
-# MAIN
+# POINT D'ENTRÉE (appelable depuis app.py / main.py)
 # ------------------------
-def main():
+def run():
+    api_before = quota.stats()
     service = gmail_service()
     label_id = get_or_create_label(service, LABEL_NAME)
 
-    try:
-        results = service.users().messages().list(
-            userId='me',
-            q="is:unread",
-            maxResults=200
-        ).execute()
-
-        messages = results.get('messages', [])
-        print(f"{len(messages)} emails non lus à traiter...")
-
-        all_info = []
-
-        for msg in messages:
-            msg_id = msg['id']
-            message = service.users().messages().get(
-                userId='me', id=msg_id, format='full'
-            ).execute()
-
-            # ---- Filtrer confirmations Google Calendar ----
-            headers = message['payload'].get('headers', [])
-            subject = ""
-            sender = ""
-
-            for h in headers:
-                if h['name'] == 'From':
-                    sender = h['value']
-                if h['name'] == 'Subject':
-                    subject = h['value']
-
-            if ("confirmation" in subject.lower()) or \
-               ("invitation" in subject.lower()) or \
-               (INTERNAL_DOMAIN in sender.lower()):
-                continue
-
-            # ---- Récupérer corps ----
-            payload = message['payload']
-            if 'parts' in payload:
-                body_data = payload['parts'][0]['body'].get('data', '')
-            else:
-                body_data = payload['body'].get('data', '')
-
-            if body_data:
-                email_body = base64.urlsafe_b64decode(body_data.encode('ASCII')).decode('utf-8')
+    with metrics.stage('gmail_list'):
+        msg_ids, history_id = sync_message_ids(service)
+
+    all_info = []
+    processed_ids = []
+    failures = []
+    skipped = 0
+
+    # Les emails sont récupérés et analysés paquet par paquet, en deux temps :
+    # 1) en-têtes From/Subject seulement, 2) corps complet des vrais prospects
+    for start in range(0, len(msg_ids), BATCH_SIZE):
+        chunk = msg_ids[start:start + BATCH_SIZE]
+
+        with metrics.stage('gmail_get_metadata'):
+            headers_only = fetch_messages(service, chunk, fmt='metadata', failures=failures,
+                                          metadata_headers=['From', 'Subject'])
+
+        lead_ids = []
+        for message in headers_only:
+            # Déjà traité (ex : vu à la fois par la resynchro et l'historique)
+            if label_id and label_id in message.get('labelIds', []):
+                skipped += 1
+            elif not is_lead(message):
+                skipped += 1
             else:
-                email_body = ""
-
-            info = extract_info(email_body)
-            all_info.append(info)
-
-            mark_email_processed(service, msg_id, label_id)
-
-        if all_info:
-            save_to_excel(all_info)
+                lead_ids.append(message['id'])
+
+        with metrics.stage('gmail_get_full'):
+            full_messages = fetch_messages(service, lead_ids, failures=failures)
+
+        with metrics.stage('extraction'):
+            for message in full_messages:
+                all_info.append(parse_message(message))
+                processed_ids.append(message['id'])
+        progress(start + len(chunk), len(msg_ids))
+
+    # On sauvegarde avant de marquer : un crash ne fait pas perdre de prospect
+    if all_info:
+        with metrics.stage('store_save'):
+            save_prospects(all_info)
+
+    with metrics.stage('gmail_modify'):
+        marked = mark_emails_processed(service, processed_ids, label_id)
+    metrics.count('emails_ignores', skipped)
+    # Les emails non récupérés (hors 404 : supprimés) seront re-tentés au prochain passage
+    retry_ids = [f['id'] for f in failures if f.get('id') and f.get('status') != 404]
+    save_history_id(history_id, retry_ids)
+
+    log("Tous les emails clients ont été traités avec succès !")
+
+    return {
+        'counts': {
+            'emails': len(msg_ids),
+            'prospects': len(all_info),
+            'ignores': skipped,
+            'marques': marked,
+        },
+        'failures': failures,
+        'api': quota.stats_since(api_before),
+    }
 
-        print("Tous les emails clients ont été traités avec succès !")
 
+# ------------------------
+# MAIN
+# ------------------------
+def main():
+    try:
+        run()
     except HttpError as error:
-        print(f"Une erreur est survenue : {error}")
+        log(f"Une erreur est survenue : {error}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,19 @@
 
 import streamlit as st
-import subprocess
 import pandas as pd
-import openpyxl
 import os
 import io
 import importlib
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-import sys
 import time
 
+import calendar_preview
+import google_clients
+import jobs
+import metrics
+import outbox
+import prospect_store
+import worker
+
 # --- BLOC DE DÉPLOIEMENT SÉCURISÉ ---
 def setup_remote_files():
     # Mapping: "Nom du fichier sur le disque" : "Nom de la clé dans secrets.toml"
@@ -73,131 +75,306 @@ st.write("")
 # Paths
 # -------------------
 EXCEL_FILE = "prospects.xlsx"
-AGENT_SCRIPT = "agent2.py"
-DATE_SCRIPT = "date.py"
+AGENT_MODULE = "agent2"
+DATE_MODULE = "date"
 CREDENTIALS = "credentials.json"
 CALENDAR_TOKEN = "token_calendar.json"
+CALENDAR_READONLY_SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+CALENDAR_CACHE_TTL = int(os.environ.get("CALENDAR_CACHE_TTL", calendar_preview.DEFAULT_TTL))
+PROSPECTS_SIDECAR = os.path.join(".cache", "prospects.feather")
 
 # -------------------
 # Helpers
 # -------------------
-def read_excel_df(path=EXCEL_FILE):
-    if not os.path.exists(path):
-        return pd.DataFrame()
+def prospects_signature():
+    """Version des données prospects (triggers) : l'outbox, l'historique des jobs et
+    les statistiques, écrits dans la même base, n'invalident pas le cache."""
+    conn = prospect_store.connect()
+    try:
+        return prospect_store.data_version(conn)
+    finally:
+        conn.close()
+
+def _read_sidecar(signature):
+    sig_path = PROSPECTS_SIDECAR + ".sig"
+    if not os.path.exists(PROSPECTS_SIDECAR) or not os.path.exists(sig_path):
+        return None
+    with open(sig_path, encoding="utf-8") as f:
+        if f.read() != repr(signature):
+            return None
+    return pd.read_feather(PROSPECTS_SIDECAR).set_index("id")
+
+def _write_sidecar(df, signature):
+    os.makedirs(os.path.dirname(PROSPECTS_SIDECAR), exist_ok=True)
+    tmp_path = PROSPECTS_SIDECAR + ".tmp"
+    df.reset_index().to_feather(tmp_path)
+    os.replace(tmp_path, PROSPECTS_SIDECAR)
+    with open(PROSPECTS_SIDECAR + ".sig", "w", encoding="utf-8") as f:
+        f.write(repr(signature))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_prospects_df(signature):
+    """Partagé entre sessions ; relu seulement quand la signature change."""
+    try:
+        df = _read_sidecar(signature)
+        if df is not None:
+            return df
+    except Exception:
+        pass  # sidecar illisible : on repart de la base
+
+    conn = prospect_store.connect()
+    try:
+        df = prospect_store.read_dataframe(conn)
+    finally:
+        conn.close()
+
+    try:
+        _write_sidecar(df, signature)
+    except Exception:
+        pass  # le sidecar n'est qu'une accélération
+    return df
+
+def read_prospects_df():
     try:
-        df = pd.read_excel(path)
-        return df
+        return load_prospects_df(prospects_signature())
     except Exception as e:
-        st.error(f"Erreur lecture Excel: {e}")
+        st.error(f"Erreur lecture base prospects: {e}")
         return pd.DataFrame()
 
-def run_script(script_path):
-    """Exécute un script via subprocess et renvoie (ok, output)."""
-    if not os.path.exists(script_path):
-        return False, f"Script introuvable : {script_path}"
+def read_funnel_stats():
+    # Agrégats tenus à jour par la base : lecture en temps constant, quel que soit l'historique
     try:
-        proc = subprocess.run([sys.executable, script_path], capture_output=True, text=True, check=False)
-        out = ""
-        if proc.stdout:
-            out += proc.stdout
-        if proc.stderr:
-            out += ("\n=== ERREURS ===\n" + proc.stderr)
-        return proc.returncode == 0, out
+        conn = prospect_store.connect()
+        try:
+            return prospect_store.funnel_stats(conn)
+        finally:
+            conn.close()
     except Exception as e:
-        return False, str(e)
+        st.error(f"Erreur lecture base prospects: {e}")
+        return None
+
+def search_prospects(query, traite, limit, offset):
+    try:
+        conn = prospect_store.connect()
+        try:
+            return prospect_store.search_prospects(conn, query, traite, limit, offset)
+        finally:
+            conn.close()
+    except Exception as e:
+        st.error(f"Erreur recherche prospects: {e}")
+        return [], 0
+
+def get_prospects_by_id(prospect_ids):
+    conn = prospect_store.connect()
+    try:
+        return prospect_store.get_prospects(conn, prospect_ids)
+    finally:
+        conn.close()
+
+def clear_prospect_selection():
+    # Vide aussi l'état des multiselects de page, sinon la sélection revient au rendu suivant
+    st.session_state["selected_prospects"] = {}
+    for key in [k for k in st.session_state if str(k).startswith("prospect_pick_")]:
+        del st.session_state[key]
+
+DOCUMENT_STATUS_LABELS = {
+    "pending": "⏳ en file",
+    "sending": "📤 en cours",
+    "sent": "✅ envoyé",
+    "failed": "⚠️ échec",
+}
+
+def show_documents_status():
+    """Statut par destinataire du dernier envoi groupé, relu dans l'outbox à chaque rendu."""
+    batch = st.session_state.get("documents_batch")
+    if not batch:
+        return
+    try:
+        date_mod = importlib.import_module("date")
+        status = outbox.status_for([row["key"] for row in batch if row["key"]], date_mod.DOCUMENTS_TEMPLATE)
+    except Exception as e:
+        st.write(f"Statut des envois indisponible : {e}")
+        return
+    rows = []
+    for row in batch:
+        info = status.get(row["key"]) if row["key"] else None
+        rows.append({
+            "Prospect": row["Prospect"],
+            "Email": row["Email"] or "—",
+            "Statut": DOCUMENT_STATUS_LABELS.get(info["status"], info["status"]) if info else "❌ sans email",
+            "Tentatives": info["attempts"] if info else 0,
+            "Envoyé le": (info or {}).get("sent_at") or "",
+            "Erreur": (info or {}).get("last_error") or "",
+        })
+    table = pd.DataFrame(rows)
+    st.caption(" · ".join(f"{label} : {n}" for label, n in table["Statut"].value_counts().items()))
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+def format_hours(hours):
+    if hours is None:
+        return f"> {prospect_store.LATENCY_BUCKETS_H[-1] // 24} j"
+    return f"≤ {hours} h" if hours < 48 else f"≤ {hours // 24} j"
+
+def start_module_job(module_name):
+    """Lance <module>.run() dans un thread de fond (un seul job actif par module)."""
+    module = importlib.import_module(module_name)
+    return jobs.start_job(module_name, module.run)
+
+def show_job(job_key, label):
+    """Affiche l'état du job de la session ; renvoie True s'il tourne encore."""
+    job = jobs.get_job(st.session_state.get(job_key, ""))
+    if job is None:
+        return False
+    if job.running:
+        st.info(f"⏳ {label} en cours ({job.duration:.0f} s)...")
+        if job.total:
+            st.progress(min(job.done / job.total, 1.0), text=f"{job.done}/{job.total}")
+    elif job.status == "done":
+        st.success(f"✅ {label} terminé en {job.duration:.1f} s")
+        counts = job.result.get("counts", {})
+        st.write(" · ".join(f"**{k}** : {v}" for k, v in counts.items()))
+        for f in job.result.get("failures", []):
+            st.write(f"- {f}")
+        api = job.result.get("api", {})
+        if api:
+            st.caption(" · ".join(f"{k} : {round(v, 2)}" for k, v in sorted(api.items())))
+    elif job.status == "skipped":
+        st.warning(f"⏭️ {label} : déjà en cours ailleurs (worker ?), lancement ignoré.")
+    else:
+        st.error(f"⚠️ {label} : {job.error}")
+    st.code("\n".join(job.logs()[-200:]), language="bash")
+    return job.running
+
+@st.cache_resource
+def load_google_clients():
+    """Précharge une fois par processus les documents de découverte (partagés entre sessions)."""
+    for api, version in (("calendar", "v3"), ("gmail", "v1"), ("drive", "v3")):
+        google_clients.get_discovery_document(api, version)
+    return google_clients
+
+@st.cache_resource
+def get_calendar_preview():
+    """Cache de l'aperçu partagé par toutes les sessions du processus."""
+    clients = load_google_clients()
+    return calendar_preview.CalendarPreviewCache(
+        lambda: clients.get_service('calendar', 'v3', CALENDAR_TOKEN, CALENDAR_READONLY_SCOPES, interactive=False),
+        ttl=CALENDAR_CACHE_TTL
+    )
 
 def get_calendar_events(max_results=8):
     if not os.path.exists(CALENDAR_TOKEN) or not os.path.exists(CREDENTIALS):
         return None, "Fichier credentials/token manquant."
     try:
-        creds = Credentials.from_authorized_user_file(CALENDAR_TOKEN, ['https://www.googleapis.com/auth/calendar.readonly'])
-        service = build('calendar', 'v3', credentials=creds)
-        now = datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(calendarId='primary', timeMin=now, maxResults=max_results, singleEvents=True, orderBy='startTime').execute()
-        return events_result.get('items', []), None
+        return get_calendar_preview().upcoming(max_results=max_results), None
     except Exception as e:
         return None, str(e)
 
-def make_file_download(path):
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            st.download_button("📥 Télécharger le fichier Excel (.xlsx)", f, file_name=os.path.basename(path), mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    else:
-        st.warning("Fichier introuvable.")
-
-def make_csv_download(df, default_name="prospects_export.csv"):
-    if df is None or df.empty:
-        st.info("Aucun contenu à exporter.")
-        return
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("⬇️ Télécharger CSV", data=csv, file_name=default_name, mime="text/csv")
+def make_file_download(path=EXCEL_FILE):
+    # L'export n'est généré qu'à la demande, pas à chaque rendu de la page
+    if st.button("📦 Générer l'export Excel"):
+        conn = prospect_store.connect()
+        try:
+            st.session_state["excel_export"] = prospect_store.export_excel_bytes(conn)
+        finally:
+            conn.close()
+    if "excel_export" in st.session_state:
+        st.download_button("📥 Télécharger le fichier Excel (.xlsx)", st.session_state["excel_export"], file_name=os.path.basename(path), mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+def make_csv_download(default_name="prospects_export.csv"):
+    # Comme l'Excel : le CSV n'est encodé qu'à la demande, pas à chaque rendu
+    if st.button("🧾 Générer l'export CSV"):
+        df = read_prospects_df()
+        st.session_state["csv_export"] = df.to_csv(index=False).encode('utf-8') if not df.empty else None
+    if "csv_export" in st.session_state:
+        if st.session_state["csv_export"] is None:
+            st.info("Aucun contenu à exporter.")
+        else:
+            st.download_button("⬇️ Télécharger CSV", data=st.session_state["csv_export"], file_name=default_name, mime="text/csv")
 
 # -------------------
 # Layout
 # -------------------
 left_col, right_col = st.columns([1,2])
 
+# Agrégats tenus par la base : le rendu n'a pas besoin de charger les prospects
+funnel = read_funnel_stats() or {'total': 0, 'traites': 0, 'en_attente': 0}
+
 with left_col:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("Actions")
     st.write("")
 
+    # Les traitements tournent dans le processus, en arrière-plan :
+    # journal et progression sont relus à chaque rafraîchissement.
     if st.button("📩 Récupérer les emails "):
-        with st.spinner("Récupération..."):
-            ok, out = run_script(AGENT_SCRIPT)
-            if ok:
-                st.success("✅ agent2.py exécuté")
-            else:
-                st.error("⚠️ Erreur lors de l'exécution")
-            st.code(out, language="bash")
+        st.session_state["agent_job"] = start_module_job(AGENT_MODULE).id
+    agent_running = show_job("agent_job", "Récupération des emails")
 
     if st.button("📅 Créer RDV et envoyer confirmations"):
-        with st.spinner("Création RDV..."):
-            ok, out = run_script(DATE_SCRIPT)
-            if ok:
-                st.success("✅ date.py exécuté")
-            else:
-                st.error("⚠️ Erreur lors de l'exécution")
-            st.code(out, language="bash")
+        st.session_state["date_job"] = start_module_job(DATE_MODULE).id
+    date_running = show_job("date_job", "Création des RDV")
 
     st.write("---")
-    st.markdown("**Fichier Excel (local)**")
+    st.markdown("**Fichier Excel (export)**")
     make_file_download(EXCEL_FILE)
     st.write("")
     st.markdown("**Télécharger CSV**")
-    df_tmp = read_excel_df()
-    make_csv_download(df_tmp)
+    make_csv_download()
 
     st.write("---")
     st.markdown("**Envoyer demande de documents**")
     st.caption("Sélectionne un ou plusieurs prospects ci-dessous, choisis le collaborateur puis clique sur le bouton.")
 
-    # Load prospects for selection
-    df = read_excel_df()
-    if df.empty:
+    selected_ids = st.session_state.setdefault("selected_prospects", {})  # id -> libellé
+    if funnel['total'] == 0:
         st.info("Aucun prospect détecté (lance d'abord la récupération des emails).")
-        prospects_options = []
     else:
-        # ensure required columns exist
-        for col in ["Prénom","Nom","Email","Téléphone","Traité","Jours disponibles","Plages horaires"]:
-            if col not in df.columns:
-                df[col] = ""
-
-        # build option labels
-        def label_from_row(idx, row):
-            p = (row.get("Prénom") or "").strip()
-            n = (row.get("Nom") or "").strip()
-            e = (row.get("Email") or "").strip()
-            return f"{idx} — {p} {n} <{e}>"
-
-        prospects_list = []
-        for idx, row in df.iterrows():
-            prospects_list.append((idx, label_from_row(idx+2, row)))  # idx+2 for Excel row number (header=1)
-
-        options = [lab for (_, lab) in prospects_list]
+        # Recherche indexée + pagination : seule la page affichée est lue en base
+        f1, f2 = st.columns([3, 1])
+        query = f1.text_input("Rechercher (nom, email, téléphone, ville)", key="prospect_query")
+        status_filter = f2.selectbox("Statut", ["Non traités", "Tous", "Traités"], key="prospect_status")
+        traite = {"Tous": None, "Non traités": False, "Traités": True}[status_filter]
+
+        # Nouvelle recherche ou page hors limites : retour à la première page
+        page_size = prospect_store.SEARCH_PAGE_SIZE
+        if st.session_state.get("prospect_filter") != (query, status_filter):
+            st.session_state["prospect_filter"] = (query, status_filter)
+            st.session_state["prospect_page"] = 1
+        page = st.session_state.get("prospect_page", 1)
+        page_rows, matches = search_prospects(query, traite, page_size, (page - 1) * page_size)
+        pages = max(1, -(-matches // page_size))
+        if page > pages:
+            page = st.session_state["prospect_page"] = 1
+            page_rows, matches = search_prospects(query, traite, page_size, 0)
+        st.number_input(f"Page (sur {pages}) — {matches} résultat(s)", min_value=1, max_value=pages,
+                        key="prospect_page")
+
+        def label_from_row(row):
+            mark = " ✔️" if row["Traité"] else ""
+            return f"{row['id']} — {row['Prénom']} {row['Nom']} <{row['Email']}>{mark}"
+
+        page_labels = {row["id"]: label_from_row(row) for row in page_rows}
+        picked = st.multiselect(
+            "Choisir prospects (1+)", options=list(page_labels),
+            default=[pid for pid in page_labels if pid in selected_ids],
+            format_func=page_labels.get, key=f"prospect_pick_{query}_{status_filter}_{page}",
+        )
+        # La sélection est conservée d'une page / recherche à l'autre
+        for pid, label in page_labels.items():
+            if pid in picked:
+                selected_ids[pid] = label
+            else:
+                selected_ids.pop(pid, None)
 
-        selected = st.multiselect("Choisir prospects (1+)", options=options, default=None)
+    if selected_ids:
+        s1, s2 = st.columns([3, 1])
+        s1.caption(f"{len(selected_ids)} prospect(s) sélectionné(s) : "
+                   + ", ".join(list(selected_ids.values())[:5]) + (" …" if len(selected_ids) > 5 else ""))
+        if s2.button("Vider la sélection"):
+            clear_prospect_selection()
+            st.rerun()
 
+    if funnel['total']:
         # collaborator selection
         # try import collaborators list from date.py if present
         try:
@@ -215,71 +392,111 @@ with left_col:
             collab = {"prenom":"Automatique","nom":"","email":"u9373548876@gmail.com"}
 
         if st.button("✉️ Envoyer demande de documents"):
-            if not selected:
+            if not selected_ids:
                 st.error("Sélectionne au moins un prospect.")
+            elif any(j.name == "documents" and j.running for j in jobs.list_jobs()):
+                st.warning("Un envoi groupé est déjà en cours : attends sa fin avant d'en lancer un autre.")
             else:
-                # ensure date module gmail service is initialized
                 try:
                     date_mod = importlib.import_module("date")
-                    if not hasattr(date_mod, "gmail_service") or date_mod.gmail_service is None:
-                        date_mod.gmail_service = date_mod.get_gmail_service()
+                    # Mise en file + envoi dans un job de fond : la page rend la main tout de suite
+                    batch = get_prospects_by_id(list(selected_ids))
+                    # Un seul envoi de l'outbox à la fois (verrou partagé avec le job "date" et le worker)
+                    if outbox.drain_running():
+                        st.info("Un autre envoi d'emails est en cours : ces demandes partiront à sa suite.")
+                    st.session_state["documents_job"] = jobs.start_job(
+                        "documents", date_mod.send_documents_requests,
+                        prospect_ids=[p["id"] for p in batch], collab=collab
+                    ).id
+                    st.session_state["documents_batch"] = [
+                        {"key": p["Email"].strip().lower(), "Prospect": f"{p['Prénom']} {p['Nom']}", "Email": p["Email"]}
+                        for p in batch
+                    ]
+                    clear_prospect_selection()
                 except Exception as e:
-                    st.error(f"Impossible d'initialiser date.py : {e}")
-                    date_mod = None
-
-                successes = []
-                failures = []
-                for sel in selected:
-                    # sel example: "3 — Prénom Nom <email>"
-                    try:
-                        # extract the email from between <>
-                        email = sel.split("<")[-1].split(">")[0].strip()
-                        # find row by Excel row number (we included idx+2)
-                        excel_row_num = int(sel.split("—")[0].strip())
-                        df_row = df.iloc[excel_row_num-2]  # convert back to 0-based
-                        prenom = df_row.get("Prénom", "")
-                        nom = df_row.get("Nom", "")
-                        if date_mod:
-                            try:
-                                date_mod.send_documents_request_email(collab, prenom, nom, email)
-                                successes.append(email)
-                            except Exception as e:
-                                failures.append((email, str(e)))
-                        else:
-                            failures.append((email, "Module date.py non disponible"))
-                    except Exception as e:
-                        failures.append((sel, str(e)))
-
-                if successes:
-                    st.success(f"Email(s) envoyés à : {', '.join(successes)}")
-                if failures:
-                    st.error("Erreurs :")
-                    for f in failures:
-                        st.write(f"- {f}")
+                    st.error(f"Impossible de lancer l'envoi : {e}")
+
+    documents_running = show_job("documents_job", "Envoi des demandes de documents")
+    show_documents_status()
     st.markdown('</div>', unsafe_allow_html=True)
 
 with right_col:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("📊 Statistiques rapides")
-    df_display = read_excel_df()
-    if df_display.empty:
+    total, treated, not_treated = funnel['total'], funnel['traites'], funnel['en_attente']
+    if total == 0:
         st.warning("Aucun prospect trouvé.")
-        total = treated = not_treated = 0
-    else:
-        total = len(df_display)
-        if 'Traité' not in df_display.columns:
-            df_display['Traité'] = ""
-        treated = df_display['Traité'].fillna("").apply(lambda x: str(x).strip() == "✔️").sum()
-        not_treated = total - treated
 
     c1, c2, c3 = st.columns(3)
     c1.markdown(f"<div class='stat blue'><h2 style='margin:0'>{total}</h2><div>Totaux</div></div>", unsafe_allow_html=True)
     c2.markdown(f"<div class='stat green'><h2 style='margin:0'>{treated}</h2><div>Traités</div></div>", unsafe_allow_html=True)
     c3.markdown(f"<div class='stat red'><h2 style='margin:0'>{not_treated}</h2><div>Non traités</div></div>", unsafe_allow_html=True)
 
+    if total:
+        latency = funnel['latence']
+        if latency['n']:
+            l1, l2, l3 = st.columns(3)
+            l1.metric("Délai moyen entrée → RDV", f"{latency['moyenne_h']:.1f} h")
+            l2.metric("Médiane", format_hours(latency['p50_h']))
+            l3.metric("90 % des RDV", format_hours(latency['p90_h']))
+            st.caption("Délai entrée → RDV (nombre de prospects)")
+            st.bar_chart(pd.Series(
+                latency['histogramme'],
+                index=[format_hours(h) for h in prospect_store.LATENCY_BUCKETS_H] + [format_hours(None)],
+            ))
+
+        st.caption("Prospects par département (15 premiers)")
+        by_dept = pd.DataFrame(funnel['par_departement'][:15]).set_index('label')
+        by_dept['en attente'] = by_dept['total'] - by_dept['traites']
+        st.bar_chart(by_dept[['traites', 'en attente']])
+
+        st.caption("Prospects par tranche de budget")
+        by_budget = pd.DataFrame(funnel['par_budget']).set_index('label')
+        by_budget['taux de RDV (%)'] = (100 * by_budget['traites'] / by_budget['total']).round(1)
+        st.dataframe(by_budget, use_container_width=True)
+
     st.write("")
     st.subheader("Prochaines actions")
-    st.markdown("- Utilise la colonne **Traité** dans l'Excel pour suivre l'état.\n- Tu peux sélectionner plusieurs prospects à gauche et envoyer la demande de documents.")
+    st.markdown("- Utilise la colonne **Traité** de l'export Excel pour suivre l'état.\n- Tu peux sélectionner plusieurs prospects à gauche et envoyer la demande de documents.")
+
+    st.write("---")
+    st.subheader("🔁 Traitements automatiques")
+    status = worker.read_status()
+    if status and time.time() - status["heartbeat"] < 3 * status["interval"] + 60:
+        next_run = min(status["next_runs"].values())
+        st.success(f"Worker actif (PID {status['pid']}) — prochain passage à {time.strftime('%H:%M:%S', time.localtime(next_run))}")
+    else:
+        st.info("Aucun worker actif (lance `python worker.py` pour la relève automatique).")
+    try:
+        runs = jobs.history(limit=10)
+    except Exception as e:
+        runs = []
+        st.write(f"Historique indisponible : {e}")
+    if runs:
+        st.dataframe(pd.DataFrame([{
+            "Début": time.strftime("%d/%m %H:%M:%S", time.localtime(r["started_at"])),
+            "Traitement": r["name"],
+            "Origine": r["source"],
+            "Statut": r["status"],
+            "Durée (s)": round(r["duration"] or 0, 1),
+            "Résultat": ", ".join(f"{k}: {v}" for k, v in ((r["result"] or {}).get("counts") or {}).items()),
+        } for r in runs]), hide_index=True, use_container_width=True)
+
+    st.write("---")
+    st.subheader("📈 Performances des derniers traitements")
+    perf_runs = [r for r in reversed(runs) if r.get("metrics")]
+    if perf_runs:
+        run_labels = [f"{time.strftime('%d/%m %H:%M', time.localtime(r['started_at']))} {r['name']}" for r in perf_runs]
+        st.caption("Temps passé par étape (s)")
+        st.bar_chart(pd.DataFrame([r["metrics"]["stages"] for r in perf_runs], index=run_labels).fillna(0))
+        st.caption("Appels API par méthode")
+        st.bar_chart(pd.DataFrame([r["metrics"]["calls"] for r in perf_runs], index=run_labels).fillna(0))
+        last = perf_runs[-1]["metrics"]
+        if last.get("events"):
+            st.write(" · ".join(f"**{k}** : {v}" for k, v in last["events"].items()))
+        st.caption(f"Export Prometheus : {metrics.METRICS_DIR}/<app|worker>.prom")
+    else:
+        st.info("Pas encore de mesures (lance un traitement).")
 
     st.write("---")
     st.subheader("🗓️ Aperçu Google Calendar")
@@ -302,5 +519,10 @@ st.write("---")
 if st.button("🔁 Recharger l'interface"):
     st.rerun()
 
+# Rafraîchissement automatique tant qu'un job de la session tourne
+if agent_running or date_running or documents_running:
+    time.sleep(1)
+    st.rerun()
+
 
 
@@ -0,0 +1,201 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta, time as dtime
+
+import numpy as np
+
+# ----------------------------------------------------------
+# 📅 Disponibilités en grilles de créneaux (NumPy)
+# ----------------------------------------------------------
+# L'horizon de planification est découpé en créneaux de durée fixe
+# (jour x créneau du jour, aplati). Disponibilités des prospects et agendas
+# libres des collaborateurs deviennent des tableaux booléens de même forme :
+# un RDV possible est un ET logique, le plus tôt un argmax.
+
+# Heures ouvrées des collaborateurs (pause déjeuner 12h-13h)
+WORK_HOURS = ((10 * 60, 12 * 60), (13 * 60, 19 * 60))
+
+JOURS = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche')
+_DAY_GROUPS = {
+    'semaine': range(0, 5),
+    'weekend': range(5, 7),
+}
+# Aucune contrainte de jour / d'heure (seulement si le champ ne cite ni jour ni heure :
+# "tous les lundis", "toute la matinée" restent des contraintes)
+_ANY_WORDS = ('indifferent', 'tous', 'toute', "n'importe", 'peu importe', 'libre')
+# Plages nommées (minutes depuis minuit)
+_PERIODS = {
+    'matin': (9 * 60, 12 * 60),
+    'midi': (12 * 60, 14 * 60),
+    'apres-midi': (14 * 60, 18 * 60),
+    'soir': (18 * 60, 20 * 60),
+}
+
+# Heure : "14", "14h", "14h30", "14:30"
+_TIME = r'(\d{1,2})(?:\s*[h:]\s*(\d{2})?)?'
+# "14:00-16:00", "14h-16h", "14h30 à 16h", "9 - 12", "entre 14h et 16h"
+_RANGE_RE = re.compile(
+    rf'(?:\bentre\s+{_TIME}\s*\bet\b|{_TIME}\s*(?:-|–|/|\bau\b|\ba\b|\bjusqu\'a\b))\s*{_TIME}'
+)
+# Heure seule : "18h" (une heure), "à partir de 18h", "après 18h" (jusqu'au soir), "avant 11h"
+_HOUR_RE = re.compile(r'(?:\b(a partir de|apres|des|avant)\s+)?(\d{1,2})\s*[h:]\s*(\d{2})?')
+_DAY_RANGE_RE = re.compile(r'\b([a-z]+)\s*(?:-|–|\bau\b|\ba\b)\s*([a-z]+)\b')
+
+
+def _normalize(value):
+    text = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode('ascii')
+    text = text.lower().replace('week-end', 'weekend').replace('apres midi', 'apres-midi')
+    return re.sub(r'\b(matin|soir)ee\b', r'\1', text).strip()
+
+
+def _day_index(word):
+    if len(word) < 3:
+        return None
+    for i, name in enumerate(JOURS):
+        if name.startswith(word) or word.startswith(name):
+            return i
+    return None
+
+
+def _has_any_word(text):
+    return any(word in text for word in _ANY_WORDS)
+
+
+def _days_in(text):
+    days = set()
+    for match in _DAY_RANGE_RE.finditer(text):
+        first, last = _day_index(match.group(1)), _day_index(match.group(2))
+        if first is not None and last is not None:
+            days.update(d % 7 for d in range(first, first + (last - first) % 7 + 1))
+    for word in re.findall(r"[a-z]+", text):
+        if word in _DAY_GROUPS:
+            days.update(_DAY_GROUPS[word])
+        elif _day_index(word) is not None:
+            days.add(_day_index(word))
+    return days
+
+
+def parse_days(value):
+    """Jours acceptés (0 = lundi) ; None si le prospect n'impose rien.
+
+    Lève ValueError si le champ est renseigné mais illisible.
+    """
+    text = _normalize(value)
+    if not text:
+        return None
+
+    # "tous les jours sauf le mercredi"
+    text, _, excluded = text.partition('sauf')
+    days = _days_in(text)
+    if excluded:
+        days = (days or set(range(7))) - _days_in(excluded)
+    elif not days and _has_any_word(text):
+        return None
+
+    if not days:
+        raise ValueError(f"Jours disponibles illisibles : {value!r}")
+    return frozenset(days)
+
+
+def _minutes(hours, minutes):
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def parse_ranges(value):
+    """Plages horaires en minutes depuis minuit ; None si le prospect n'impose rien.
+
+    Lève ValueError si le champ est renseigné mais illisible (pas de plage par défaut).
+    """
+    text = _normalize(value)
+    if not text:
+        return None
+
+    ranges = []
+    for match in _RANGE_RE.finditer(text):
+        h1, m1, h2, m2, h3, m3 = match.groups()
+        start = _minutes(h1, m1) if h1 is not None else _minutes(h2, m2)
+        ranges.append((start, _minutes(h3, m3), match.group(0)))
+    # Heures isolées, hors des plages déjà lues
+    for match in _HOUR_RE.finditer(_RANGE_RE.sub(' ', text)):
+        word, hour = match.group(1), _minutes(match.group(2), match.group(3))
+        if word == 'avant':
+            ranges.append((0, hour, match.group(0)))
+        elif word:
+            ranges.append((hour, 24 * 60, match.group(0)))
+        else:
+            ranges.append((hour, hour + 60, match.group(0)))
+    for start, end, raw in ranges:
+        if not 0 <= start < end <= 24 * 60:
+            raise ValueError(f"Plage horaire invalide : {raw!r}")
+    ranges = [(start, end) for start, end, _ in ranges]
+
+    for name, period in _PERIODS.items():
+        if re.search(rf'(?<![a-z-]){name}(?![a-z-])', text):
+            ranges.append(period)
+
+    if not ranges and _has_any_word(text):
+        return None
+    if not ranges:
+        raise ValueError(f"Plages horaires illisibles : {value!r}")
+    return tuple(ranges)
+
+
+class SlotGrid:
+    """Créneaux de `slot_min` minutes sur `days` jours à partir de `first_day` (heure locale)."""
+
+    def __init__(self, first_day, days, tz, slot_min=30):
+        self.first_day = first_day
+        self.days = days
+        self.tz = tz
+        self.slot_min = slot_min
+        self.slots_per_day = 24 * 60 // slot_min
+
+        self._minutes = np.arange(self.slots_per_day) * slot_min
+        self.weekdays = np.array([(first_day + timedelta(days=d)).weekday() for d in range(days)])
+        self.starts = np.array([
+            self.slot_bounds(i)[0].timestamp() for i in range(days * self.slots_per_day)
+        ])
+        self.ends = self.starts + slot_min * 60
+        self.work = np.tile(self.time_mask(WORK_HOURS), days)
+        self._patterns = {}
+
+    def __len__(self):
+        return self.days * self.slots_per_day
+
+    def slot_bounds(self, index):
+        day, slot = divmod(int(index), self.slots_per_day)
+        start = datetime.combine(self.first_day + timedelta(days=day), dtime(0, 0), tzinfo=self.tz)
+        start += timedelta(minutes=slot * self.slot_min)
+        return start, start + timedelta(minutes=self.slot_min)
+
+    def slot_index(self, start_dt):
+        return int(np.searchsorted(self.starts, start_dt.timestamp()))
+
+    def time_mask(self, ranges):
+        """Créneaux du jour entièrement contenus dans l'une des plages."""
+        mask = np.zeros(self.slots_per_day, dtype=bool)
+        for start, end in ranges:
+            mask |= (self._minutes >= start) & (self._minutes + self.slot_min <= end)
+        return mask
+
+    def busy_mask(self, intervals):
+        """Créneaux qui chevauchent au moins un intervalle (datetimes) occupé."""
+        if not intervals:
+            return np.zeros(len(self), dtype=bool)
+        spans = sorted((s.timestamp(), e.timestamp()) for s, e in intervals)
+        busy_starts = np.array([s for s, _ in spans])
+        # fin maximale des intervalles commencés avant chaque borne : chevauchements gérés
+        busy_ends = np.maximum.accumulate(np.array([e for _, e in spans]))
+        idx = np.searchsorted(busy_starts, self.ends, side='left')
+        return (idx > 0) & (busy_ends[np.maximum(idx - 1, 0)] > self.starts)
+
+    def availability(self, jours, plages):
+        """Créneaux ouvrés acceptés par un prospect ; mis en cache par couple de valeurs."""
+        key = (jours or '', plages or '')
+        if key not in self._patterns:
+            days = parse_days(jours)
+            ranges = parse_ranges(plages)
+            day_ok = np.ones(self.days, dtype=bool) if days is None else np.isin(self.weekdays, list(days))
+            time_ok = np.ones(self.slots_per_day, dtype=bool) if ranges is None else self.time_mask(ranges)
+            self._patterns[key] = (day_ok[:, None] & time_ok[None, :]).ravel() & self.work
+        return self._patterns[key]
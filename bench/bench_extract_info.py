@@ -0,0 +1,114 @@
+"""Micro-benchmark : ancien extract_info (16 re.search) vs parseur en une passe.
+
+Usage : python bench/bench_extract_info.py [nb_emails]
+"""
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lead_parser import FIELD_KEYS, LEAD_FIELDS, extract_info  # noqa: E402
+
+
+# --- Parseur d'origine (référence) ---
+def legacy_extract_info(email_body):
+    info = {}
+    patterns = {
+        'Prénom': r'Prénom\s*[:=]?\s*(.*)',
+        'Nom': r'Nom\s*[:=]?\s*(.*)',
+        'Email': r'Email\s*[:=]?\s*(.*)',
+        'Téléphone': r'Téléphone\s*[:=]?\s*(.*)',
+        'Adresse': r'Adresse\s*[:=]?\s*(.*)',
+        'Ville': r'Ville\s*[:=]?\s*(.*)',
+        'Code postal': r'Code postal\s*[:=]?\s*(.*)',
+        'Département': r'Département\s*[:=]?\s*(.*)',
+        'Bien recherché': r'Bien recherché\s*[:=]?\s*(.*)',
+        'Budget': r"Budget d'achat\s*[:=]?\s*(.*)",
+        'Financement': r'A un dossier de financement\s*[:=]?\s*(.*)',
+        'Délai': r"Délai d'achat\s*[:=]?\s*(.*)",
+        'Secteurs': r'Secteurs de recherche\s*[:=]?\s*(.*)',
+        'Programme neuf': r'Est intéressé par du programme neuf\s*[:=]?\s*(.*)',
+        'Jours disponibles': r'Jours disponibles\s*[:=]?\s*(.*)',
+        'Plages horaires': r'Plages horaires\s*[:=]?\s*(.*)'
+    }
+
+    for key, pattern in patterns.items():
+        match = re.search(pattern, email_body, re.IGNORECASE)
+        info[key] = match.group(1).strip() if match else ''
+
+    return info
+
+
+# --- Corpus synthétique ---
+PRENOMS = ["Jean", "Marie", "Léa", "Hugo", "Chloé", "Karim", "Inès", "Paul"]
+NOMS = ["Dupont", "Martin", "Bernard", "Petit", "Durand", "Leroy", "Moreau"]
+VILLES = ["Paris", "Lyon", "Marseille", "Nantes", "Lille", "Bordeaux"]
+
+
+def make_lead(rng, i):
+    prenom = rng.choice(PRENOMS)
+    nom = rng.choice(NOMS)
+    values = {
+        'Prénom': prenom,
+        'Nom': nom,
+        'Email': f"{prenom.lower()}.{nom.lower()}{i}@example.com",
+        'Téléphone': f"06 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+        'Adresse': f"{rng.randint(1, 120)} rue de la République",
+        'Ville': rng.choice(VILLES),
+        'Code postal': f"{rng.randint(1000, 95999):05d}",
+        'Département': f"{rng.randint(1, 95):02d}",
+        'Bien recherché': rng.choice(["Appartement", "Maison", "Studio"]),
+        'Budget': f"{rng.randint(100, 900)} 000 €",
+        'Financement': rng.choice(["Oui", "Non"]),
+        'Délai': rng.choice(["Moins de 3 mois", "3 à 6 mois", "Plus de 6 mois"]),
+        'Secteurs': rng.choice(VILLES),
+        'Programme neuf': rng.choice(["Oui", "Non"]),
+        'Jours disponibles': rng.choice(["Lundi, Mardi", "Mercredi", "Samedi"]),
+        'Plages horaires': rng.choice(["10:00-12:00", "14:00-16:00, 17:00-18:00"]),
+    }
+    lines = ["Bonjour,", "", "Un nouveau prospect a rempli le formulaire :", ""]
+    lines += [f"{label} : {values[key]}" for key, label in LEAD_FIELDS]
+    lines += ["", "Cordialement,", "Le site"]
+    return "\n".join(lines), values
+
+
+def run(parser, corpus):
+    start = time.perf_counter()
+    results = [parser(body) for body, _ in corpus]
+    return time.perf_counter() - start, results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    corpus = [make_lead(rng, i) for i in range(n)]
+    print(f"Corpus : {n} emails prospects")
+
+    legacy_time, legacy_results = run(legacy_extract_info, corpus)
+    new_time, new_results = run(extract_info, corpus)
+
+    # 'Nom' : l'ancien parseur matche à l'intérieur de "Prénom", on compare donc
+    # ce champ à la vérité terrain ; les autres champs doivent être identiques.
+    mismatches = 0
+    legacy_nom_errors = 0
+    for (_, expected), old, new in zip(corpus, legacy_results, new_results):
+        if new['Nom'] != expected['Nom']:
+            mismatches += 1
+        elif any(old[k] != new[k] for k in FIELD_KEYS if k != 'Nom'):
+            mismatches += 1
+        if old['Nom'] != expected['Nom']:
+            legacy_nom_errors += 1
+
+    print(f"Ancien parseur : {legacy_time:.2f} s ({n / legacy_time:,.0f} emails/s)")
+    print(f"Nouveau parseur : {new_time:.2f} s ({n / new_time:,.0f} emails/s)")
+    print(f"Gain : x{legacy_time / new_time:.1f}")
+    print(f"Champ 'Nom' faux avec l'ancien parseur : {legacy_nom_errors}/{n}")
+    print(f"Différences avec le nouveau parseur : {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Benchmark hors-ligne du pipeline agent2 (Gmail -> prospects) et date (prospects -> RDV).
+
+Les services Google sont remplacés par les doublures en mémoire de fake_google :
+aucun réseau, aucun token. Chaque scénario tourne dans un répertoire temporaire
+(base SQLite, outbox, checkpoint Gmail neufs) et dans son propre processus pour
+que le pic mémoire mesuré soit le sien.
+
+Usage :
+    python bench/bench_pipeline.py [agent2|date|all] [--leads 10000] [--latency-ms 0]
+                                   [--busy 0.5] [--horizon 14] [--quota] [--tracemalloc]
+
+--latency-ms : latence simulée par aller-retour HTTP (une seule par batch)
+--busy       : fraction des créneaux de 30 min déjà occupés dans l'agenda
+--quota      : conserve les seaux à jetons de quota.py (désactivés par défaut,
+               sinon le benchmark mesure surtout les quotas Google)
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_extract_info import make_lead  # noqa: E402
+from fake_google import FakeCalendar, FakeDrive, FakeGmail  # noqa: E402
+
+SCENARIOS = ('agent2', 'date')
+
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _setup(args):
+    import quota
+    if not args.quota:
+        quota._buckets.clear()
+
+
+def _silence(*modules):
+    # Les journaux par prospect (print hors job) fausseraient la mesure
+    for module in modules:
+        if hasattr(module, 'log'):
+            module.log = lambda message: None
+
+
+# ----------------------------------------------------------
+# Scénarios
+# ----------------------------------------------------------
+def bench_agent2(args):
+    import agent2
+    _silence(agent2)
+
+    gmail = FakeGmail(args.leads, notification_ratio=args.notifications, latency=args.latency_ms / 1000)
+    agent2.gmail_service = lambda: gmail
+    # Pas de checkpoint : resynchro complète de la boîte simulée
+    agent2.RESYNC_MAX_MESSAGES = args.leads
+
+    start = time.perf_counter()
+    result = agent2.run()
+    elapsed = time.perf_counter() - start
+    return elapsed, args.leads, result, gmail.calls
+
+
+def bench_date(args):
+    import date
+    import outbox
+    import prospect_store
+    _silence(date, outbox)
+
+    rng = random.Random(42)
+    conn = prospect_store.connect()
+    prospect_store.add_prospects(conn, [make_lead(rng, i)[1] for i in range(args.leads)])
+    conn.close()
+
+    latency = args.latency_ms / 1000
+    calendar = FakeCalendar(busy_density=args.busy, latency=latency)
+    gmail = FakeGmail(0, latency=latency)
+    drive = FakeDrive(latency=latency)
+    date.get_calendar_service = lambda: calendar
+    date.get_gmail_service = lambda: gmail
+    date.get_drive_service = lambda: drive
+    date.HORIZON_JOURS = args.horizon
+
+    start = time.perf_counter()
+    result = date.run()
+    elapsed = time.perf_counter() - start
+    calls = {}
+    for api in (calendar, gmail, drive):
+        calls.update(api.calls)
+    return elapsed, args.leads, result, calls
+
+
+def run_scenario(name, args):
+    if args.tracemalloc:
+        tracemalloc.start()
+    elapsed, items, result, calls = globals()[f"bench_{name}"](args)
+    report = {
+        'scenario': name,
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'items_per_s': round(items / elapsed, 1) if elapsed else None,
+        'counts': result['counts'],
+        'failures': len(result['failures']),
+        'api_calls': dict(sorted(calls.items())),
+        'quota_waits': result['api'].get('throttle_seconds', 0),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    if args.tracemalloc:
+        report['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return report
+
+
+def print_report(report):
+    print(f"\n=== {report['scenario']} : {report['items']} éléments ===")
+    print(f"Durée           : {report['seconds']:.3f} s  ({report['items_per_s']} éléments/s)")
+    print(f"Résultat        : {report['counts']}  (échecs : {report['failures']})")
+    print(f"Pic RSS         : {report['peak_rss_mb']} Mo")
+    if 'tracemalloc_peak_mb' in report:
+        print(f"Pic tracemalloc : {report['tracemalloc_peak_mb']} Mo")
+    print("Appels API      :")
+    for method, n in report['api_calls'].items():
+        print(f"  {method:<40} {n:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenario', nargs='?', default='all', choices=SCENARIOS + ('all',))
+    parser.add_argument('--leads', type=int, default=10_000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--busy', type=float, default=0.5)
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--notifications', type=float, default=0.3,
+                        help="part des emails qui sont des notifications d'agenda")
+    parser.add_argument('--quota', action='store_true')
+    parser.add_argument('--tracemalloc', action='store_true')
+    parser.add_argument('--json', action='store_true', help="sortie JSON (une ligne par scénario)")
+    args = parser.parse_args()
+
+    if args.scenario == 'all':
+        # Un processus par scénario : pic mémoire isolé
+        argv = [a for a in sys.argv[1:] if a != 'all']
+        for name in SCENARIOS:
+            subprocess.run([sys.executable, os.path.abspath(__file__), name] + argv, check=True)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as workdir:
+        os.chdir(workdir)
+        _setup(args)
+        report = run_scenario(args.scenario, args)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Débit : httplib2 (un client par thread) vs transport partagé (pool).
+
+Usage : python bench/bench_transport.py [nb_requetes] [threads] [latence_ms]
+Tout passe par le serveur local bench/fake_http_server.py (aucun accès réseau).
+"""
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httplib2  # noqa: E402
+
+import transport  # noqa: E402
+from fake_http_server import StandInServer  # noqa: E402
+
+
+def run_httplib2(url, n, threads):
+    # Avant : httplib2 n'étant pas thread-safe, chaque thread a son client
+    local = threading.local()
+
+    def call(i):
+        if not hasattr(local, "http"):
+            local.http = httplib2.Http()
+        resp, _ = local.http.request(f"{url}/gmail/v1/users/me/messages/{i}", "GET")
+        return resp.status
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(call, range(n)))
+
+
+def run_pooled(url, n, threads):
+    http = transport.PooledHttp(transport.pooled_session())
+
+    def call(i):
+        resp, _ = http.request(f"{url}/gmail/v1/users/me/messages/{i}", "GET")
+        return resp.status
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(call, range(n)))
+
+
+def measure(label, runner, n, threads, latency):
+    server = StandInServer(latency=latency).start()
+    try:
+        start = time.perf_counter()
+        statuses = runner(server.url, n, threads)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert all(s == 200 for s in statuses)
+    print(f"{label:<28} {elapsed:6.2f} s  {n / elapsed:8.0f} req/s  "
+          f"{server.counters['connections']:4d} connexions TCP")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = (int(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+
+    print(f"{n} requêtes, {threads} threads, latence serveur {latency * 1000:.0f} ms")
+    measure("httplib2 séquentiel", lambda url, n, _: run_httplib2(url, n, 1), n, threads, latency)
+    measure("httplib2, client par thread", run_httplib2, n, threads, latency)
+    measure("transport partagé (pool)", run_pooled, n, threads, latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Doublure en mémoire des API Gmail, Calendar et Drive utilisées par agent2 et date.
+
+Les objets imitent la chaîne googleapiclient (service.users().messages().get(...)
+renvoie une requête avec .execute() et .methodId), y compris les requêtes
+batch, pour passer par quota.execute() comme en production.
+"""
+import time
+import base64
+import random
+import threading
+from datetime import datetime, timedelta, time as dtime, timezone
+
+from bench_extract_info import make_lead
+
+
+class FakeApi:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def count(self, method_id):
+        with self._lock:
+            self.calls[method_id] = self.calls.get(method_id, 0) + 1
+
+    def request(self, method_id, handler):
+        return FakeRequest(self, method_id, handler)
+
+
+class FakeRequest:
+    def __init__(self, api, method_id, handler):
+        self.api = api
+        self.methodId = method_id
+        self.handler = handler
+
+    def execute(self):
+        self.api.count(self.methodId)
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        return self.handler()
+
+
+class FakeBatch:
+    """Un seul aller-retour pour toutes les sous-requêtes, comme batch HTTP."""
+
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self._requests = {}
+        self._order = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self._order))
+        self._requests[request_id] = request
+        self._order.append(request_id)
+
+    def execute(self):
+        self.api.count('batch')
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        for request_id in self._order:
+            request = self._requests[request_id]
+            self.api.count(request.methodId)
+            try:
+                response, error = request.handler(), None
+            except Exception as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+# ----------------------------------------------------------
+# Gmail
+# ----------------------------------------------------------
+class FakeGmail(FakeApi):
+    def __init__(self, n_messages, notification_ratio=0.3, latency=0.0, seed=42):
+        super().__init__(latency)
+        rng = random.Random(seed)
+        self.seed = seed
+        self.message_ids = [f"m{i:07d}" for i in range(n_messages)]
+        self.notifications = {mid for mid in self.message_ids if rng.random() < notification_ratio}
+        self.message_labels = {mid: {'UNREAD', 'INBOX'} for mid in self.message_ids}
+        self.label_ids = {}
+        self.sent = 0
+        self.history_id = 1000
+
+    # --- chaîne users() ---
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return _FakeHistory(self)
+
+    def labels(self):
+        return _FakeLabels(self)
+
+    def getProfile(self, userId):
+        return self.request('gmail.users.getProfile', lambda: {'historyId': str(self.history_id)})
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    # --- labels ---
+    def list_labels(self):
+        return {'labels': [{'id': lid, 'name': name} for name, lid in self.label_ids.items()]}
+
+    def create_label(self, body):
+        label_id = f"Label_{len(self.label_ids) + 1}"
+        self.label_ids[body['name']] = label_id
+        return {'id': label_id}
+
+    # --- messages ---
+    def list(self, userId, q=None, maxResults=100, pageToken=None):
+        def handler():
+            unread = [mid for mid in self.message_ids if 'UNREAD' in self.message_labels[mid]]
+            start = int(pageToken or 0)
+            page = unread[start:start + maxResults]
+            result = {'messages': [{'id': mid} for mid in page]}
+            if start + maxResults < len(unread):
+                result['nextPageToken'] = str(start + maxResults)
+            return result
+        return self.request('gmail.users.messages.list', handler)
+
+    def _headers(self, msg_id):
+        if msg_id in self.notifications:
+            return [{'name': 'From', 'value': 'calendar-notification@calendar.google.com'},
+                    {'name': 'Subject', 'value': 'Invitation: RDV'}]
+        return [{'name': 'From', 'value': 'formulaire@site.fr'},
+                {'name': 'Subject', 'value': 'Nouveau prospect'}]
+
+    def get(self, userId, id, format='full', metadataHeaders=None):
+        def handler():
+            message = {'id': id, 'labelIds': sorted(self.message_labels[id])}
+            headers = self._headers(id)
+            if format == 'metadata':
+                message['payload'] = {'headers': headers}
+                return message
+            body, _ = make_lead(random.Random(f"{self.seed}-{id}"), int(id[1:]))
+            data = base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')
+            message['payload'] = {
+                'mimeType': 'multipart/alternative',
+                'headers': headers,
+                'parts': [{'partId': '0', 'mimeType': 'text/plain',
+                           'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset=UTF-8'}],
+                           'body': {'data': data, 'size': len(body)}}],
+            }
+            return message
+        return self.request('gmail.users.messages.get', handler)
+
+    def batchModify(self, userId, body):
+        def handler():
+            for msg_id in body['ids']:
+                self.message_labels[msg_id].update(body.get('addLabelIds', []))
+                self.message_labels[msg_id].difference_update(body.get('removeLabelIds', []))
+            return {}
+        return self.request('gmail.users.messages.batchModify', handler)
+
+    def send(self, userId, body):
+        def handler():
+            with self._lock:
+                self.sent += 1
+                return {'id': f"sent{self.sent}"}
+        return self.request('gmail.users.messages.send', handler)
+
+
+class _FakeLabels:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def list(self, userId):
+        return self.gmail.request('gmail.users.labels.list', self.gmail.list_labels)
+
+    def create(self, userId, body):
+        return self.gmail.request('gmail.users.labels.create', lambda: self.gmail.create_label(body))
+
+
+class _FakeHistory:
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def list(self, userId, startHistoryId, **params):
+        return self.gmail.request('gmail.users.history.list',
+                                  lambda: {'history': [], 'historyId': str(self.gmail.history_id)})
+
+
+# ----------------------------------------------------------
+# Calendar / Drive
+# ----------------------------------------------------------
+class FakeCalendar(FakeApi):
+    """Agenda dont une fraction `busy_density` des créneaux de 30 min est occupée."""
+
+    def __init__(self, busy_density=0.5, latency=0.0, seed=42):
+        super().__init__(latency)
+        self.busy_density = busy_density
+        self.seed = seed
+        self.inserted = []
+
+    def freebusy(self):
+        return self
+
+    def events(self):
+        return self
+
+    def query(self, body):
+        def handler():
+            start = datetime.fromisoformat(body['timeMin']).astimezone(timezone.utc)
+            end = datetime.fromisoformat(body['timeMax']).astimezone(timezone.utc)
+            return {'calendars': {item['id']: {'busy': self._busy(item['id'], start, end)}
+                                  for item in body['items']}}
+        return self.request('calendar.freebusy.query', handler)
+
+    def _busy(self, calendar_id, start, end):
+        rng = random.Random(f"{self.seed}-{calendar_id}")  # agenda différent par collaborateur
+        busy = []
+        day = start.date()
+        while datetime.combine(day, dtime(0, 0), tzinfo=timezone.utc) < end:
+            slot = datetime.combine(day, dtime(7, 0), tzinfo=timezone.utc)
+            for _ in range(26):  # 7h-20h UTC
+                if rng.random() < self.busy_density:
+                    busy.append({'start': slot.isoformat(), 'end': (slot + timedelta(minutes=30)).isoformat()})
+                slot += timedelta(minutes=30)
+            day += timedelta(days=1)
+        return busy
+
+    def insert(self, calendarId, body, sendUpdates=None):
+        def handler():
+            with self._lock:
+                self.inserted.append(body)
+                return {'id': f"ev{len(self.inserted)}"}
+        return self.request('calendar.events.insert', handler)
+
+
+class FakeDrive(FakeApi):
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.created = 0
+
+    def files(self):
+        return self
+
+    def create(self, body, fields=None):
+        def handler():
+            with self._lock:
+                self.created += 1
+                return {'id': f"folder{self.created}"}
+        return self.request('drive.files.create', handler)
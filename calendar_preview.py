@@ -0,0 +1,92 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+
+import quota
+
+# ----------------------------------------------------------
+# 🗓️ Cache de l'aperçu Google Calendar
+# ----------------------------------------------------------
+# Une synchronisation complète, puis des mises à jour incrémentales via
+# nextSyncToken ; Google n'est interrogé qu'une fois par TTL, quel que soit
+# le nombre d'utilisateurs ou de rafraîchissements de la page.
+DEFAULT_TTL = 60  # secondes
+PAGE_SIZE = 250
+
+
+def _parse_when(when):
+    if 'dateTime' in when:
+        return datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00'))
+    # Événement sur la journée entière
+    return datetime.fromisoformat(when['date']).replace(tzinfo=timezone.utc)
+
+
+class CalendarPreviewCache:
+    def __init__(self, service_factory, calendar_id='primary', ttl=DEFAULT_TTL):
+        self.service_factory = service_factory
+        self.calendar_id = calendar_id
+        self.ttl = ttl
+        self.events = {}
+        self.sync_token = None
+        self.fetched_at = None
+        self._lock = threading.Lock()
+
+    def upcoming(self, max_results=8):
+        with self._lock:
+            if self.fetched_at is None or time.monotonic() - self.fetched_at >= self.ttl:
+                self._refresh()
+
+            now = datetime.now(timezone.utc)
+            for event_id in [i for i, ev in self.events.items() if _parse_when(ev['end']) <= now]:
+                del self.events[event_id]
+            items = list(self.events.values())
+
+        items.sort(key=lambda ev: _parse_when(ev['start']))
+        return items[:max_results]
+
+    def _refresh(self):
+        service = self.service_factory()
+
+        if self.sync_token:
+            try:
+                self._sync(service, syncToken=self.sync_token)
+            except HttpError as error:
+                # 410 : jeton expiré, il faut tout resynchroniser
+                if error.resp.status != 410:
+                    raise
+                self._full_sync(service)
+        else:
+            self._full_sync(service)
+
+        self.fetched_at = time.monotonic()
+
+    def _full_sync(self, service):
+        self.events = {}
+        self.sync_token = None
+        time_min = datetime.now(timezone.utc) - timedelta(days=1)
+        self._sync(service, timeMin=time_min.isoformat())
+
+    def _sync(self, service, **params):
+        page_token = None
+
+        while True:
+            result = quota.execute(service.events().list(
+                calendarId=self.calendar_id,
+                singleEvents=True,
+                maxResults=PAGE_SIZE,
+                pageToken=page_token,
+                **params
+            ))
+
+            for event in result.get('items', []):
+                if event.get('status') == 'cancelled':
+                    self.events.pop(event['id'], None)
+                else:
+                    self.events[event['id']] = event
+
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                self.sync_token = result.get('nextSyncToken')
+                return
@@ -1,16 +1,19 @@
 from __future__ import print_function
-import os.path
-import random
-from datetime import datetime, timedelta, time as dtime, timezone
-import base64
-import openpyxl
-from email.mime.text import MIMEText
-import pandas as pd
-
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import google_clients
+import jobs
+import metrics
+import outbox
+import prospect_store
+import quota
+from availability import SlotGrid
+from jobs import log
 
 # ==============================
 # CONFIGURATION
@@ -21,10 +24,14 @@ SCOPES_DRIVE = ['https://www.googleapis.com/auth/drive']  # <-- AJOUT DRIVE
 
 DUREE_APPEL_MIN = 30
 TIMEZONE = 'Europe/Paris'
-
-EXCEL_FILE = "prospects.xlsx"
+TZ = ZoneInfo(TIMEZONE)
+HORIZON_JOURS = 14  # fenêtre de planification (une seule requête freebusy, grille de créneaux)
+MAX_WORKERS = 8     # prospects traités en parallèle
+BALANCE_WINDOW_MIN = 60  # créneaux à moins d'1 h du plus tôt : on préfère le collaborateur le moins chargé
+DOCUMENTS_TEMPLATE = "demande_documents"
 
 # --- Liste des collaborateurs ---
+# Leur agenda (clé "calendar", sinon leur email) doit être partagé en lecture libre/occupé
 collaborateurs = [
     {"nom": "Dupont", "prenom": "Marie", "email": "oussalahsalma9@gmail.com"},
     {"nom": "Martin", "prenom": "Alex", "email": "alex.pro@example.com"}
@@ -33,78 +40,26 @@ collaborateurs = [
 # ==============================
 # SERVICES GOOGLE
 # ==============================
+# Clients partagés par google_clients (thread-safe, pool de connexions commun)
 def get_calendar_service():
-    creds = None
-    if os.path.exists('token_calendar.json'):
-        creds = Credentials.from_authorized_user_file('token_calendar.json', SCOPES_CALENDAR)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES_CALENDAR)
-            creds = flow.run_local_server(port=0)
-        with open('token_calendar.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return build('calendar', 'v3', credentials=creds)
+    return google_clients.get_service('calendar', 'v3', 'token_calendar.json', SCOPES_CALENDAR)
 
 
 def get_gmail_service():
-    creds = None
-    if os.path.exists('token_gmail.json'):
-        creds = Credentials.from_authorized_user_file('token_gmail.json', SCOPES_GMAIL)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES_GMAIL)
-            creds = flow.run_local_server(port=0)
-        with open('token_gmail.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return build('gmail', 'v1', credentials=creds)
+    return google_clients.get_service('gmail', 'v1', 'token_gmail.json', SCOPES_GMAIL)
 
 
 # ----------- SERVICE DRIVE -----------
 def get_drive_service():
-    creds = None
-    if os.path.exists('token_drive.json'):
-        creds = Credentials.from_authorized_user_file('token_drive.json', SCOPES_DRIVE)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES_DRIVE)
-            creds = flow.run_local_server(port=0)
-        with open('token_drive.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return build('drive', 'v3', credentials=creds)
-
-
-# ==============================
-# ENVOI D'EMAIL
-# ==============================
-def send_email(sender, to, subject, body_text):
-    msg = MIMEText(body_text, "plain", "utf-8")
-    msg['To'] = to
-    msg['From'] = sender
-    msg['Subject'] = subject
-
-    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-    gmail_service.users().messages().send(
-        userId="me",
-        body={'raw': raw}
-    ).execute()
+    return google_clients.get_service('drive', 'v3', 'token_drive.json', SCOPES_DRIVE)
 
 
 # ==============================
 # MAIL : Demande de documents
 # ==============================
-def send_documents_request_email(collab, prenom, nom, email):
+# Mise en outbox (un seul envoi par prospect) ; l'envoi réel est fait par outbox.drain()
+def documents_request(collab, prenom, nom, email):
+    """Message de demande de documents, au format attendu par outbox.enqueue()."""
     subject = "Documents nécessaires pour ton analyse patrimoniale"
 
     body = f"""
@@ -129,13 +84,44 @@ Une fois les documents reçus, je procède à ton analyse et je te recontacte po
 {collab['prenom']} {collab['nom']}
 """
 
-    send_email(collab["email"], email, subject, body)
+    return email, DOCUMENTS_TEMPLATE, collab["email"], email, subject, body
+
+
+def send_documents_request_email(collab, prenom, nom, email):
+    return outbox.enqueue(*documents_request(collab, prenom, nom, email))
+
+
+# Envoi groupé depuis app.py : job de fond (mise en file + envoi, concurrence bornée)
+def send_documents_requests(prospect_ids, collab, concurrency=outbox.SEND_CONCURRENCY):
+    conn = prospect_store.connect()
+    try:
+        prospects = prospect_store.get_prospects(conn, prospect_ids)
+    finally:
+        conn.close()
+
+    with_email = [p for p in prospects if p["Email"]]
+    added = outbox.enqueue_many([
+        documents_request(collab, p["Prénom"] or "Client", p["Nom"] or "", p["Email"]) for p in with_email
+    ])
+    log(f"{sum(added)} demande(s) mise(s) en file, {len(added) - sum(added)} déjà demandée(s)")
+
+    result = outbox.drain(get_gmail_service(), concurrency=concurrency)
+    # Un drain concurrent (job "date") a pu envoyer une partie du lot : on compte sur l'outbox
+    new_keys = [p["Email"] for p, is_new in zip(with_email, added) if is_new]
+    statuses = outbox.status_for(new_keys, DOCUMENTS_TEMPLATE)
+    result['counts'].update({
+        'envoyes': sum(1 for s in statuses.values() if s['status'] == 'sent'),
+        'mis_en_file': sum(added),
+        'deja_demandes': len(added) - sum(added),
+        'sans_email': len(prospects) - len(with_email),
+    })
+    return result
 
 
 # ==============================
 # DRIVE : Création du dossier client
 # ==============================
-def create_drive_folder(prenom, nom):
+def create_drive_folder(prenom, nom, service):
     folder_name = f"{prenom} {nom} - Documents"
 
     file_metadata = {
@@ -143,144 +129,292 @@ def create_drive_folder(prenom, nom):
         "mimeType": "application/vnd.google-apps.folder"
     }
 
-    folder = drive_service.files().create(
+    folder = quota.execute(service.files().create(
         body=file_metadata,
         fields="id"
-    ).execute()
+    ))
 
-    print(f"Dossier Drive créé : {folder_name} (ID: {folder['id']})")
+    log(f"Dossier Drive créé : {folder_name} (ID: {folder['id']})")
     return folder["id"]
 
 
 # ==============================
 # UTILITAIRES
 # ==============================
-def is_slot_free(service, start_dt, end_dt):
-    start_dt = start_dt.replace(tzinfo=timezone(timedelta(hours=1)))
-    end_dt = end_dt.replace(tzinfo=timezone(timedelta(hours=1)))
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=start_dt.isoformat(),
-        timeMax=end_dt.isoformat(),
-        singleEvents=True
-    ).execute()
-
-    return len(events_result.get('items', [])) == 0
-
+def _parse_rfc3339(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def load_busy_intervals(service, time_min, time_max, calendar_ids=('primary',)):
+    """Une seule requête freebusy pour tous les agendas ; intervalles occupés par agenda.
+
+    None pour un agenda illisible (non partagé, introuvable) : rien ne dit qu'il est libre.
+    """
+    result = quota.execute(service.freebusy().query(body={
+        'timeMin': time_min.isoformat(),
+        'timeMax': time_max.isoformat(),
+        'timeZone': TIMEZONE,
+        'items': [{'id': calendar_id} for calendar_id in calendar_ids]
+    }))
+
+    calendars = result.get('calendars', {})
+    intervals = {}
+    for calendar_id in calendar_ids:
+        calendar = calendars.get(calendar_id)
+        if calendar is None or calendar.get('errors'):
+            reason = calendar['errors'][0].get('reason') if calendar else "absent de la réponse"
+            log(f"Agenda {calendar_id} illisible ({reason}) : collaborateur exclu de la répartition")
+            intervals[calendar_id] = None
+            continue
+        intervals[calendar_id] = [
+            (_parse_rfc3339(busy['start']), _parse_rfc3339(busy['end']))
+            for busy in calendar.get('busy', [])
+        ]
+    return intervals
+
+
+def _calendar_id(collab):
+    return collab.get('calendar', collab['email'])
+
+
+# --- Affectation des RDV entre collaborateurs ---
+class Planning:
+    """Créneaux libres (une ligne par collaborateur de la grille) et charge de chacun.
+
+    Chaque prospect va au collaborateur qui a le créneau commun le plus tôt ; parmi
+    ceux dont ce créneau tombe dans BALANCE_WINDOW_MIN, le moins chargé l'emporte.
+    """
+
+    def __init__(self, collabs, busy_by_calendar, grid):
+        self.collabs = list(collabs)
+        self.grid = grid
+        self._index = {c['email']: i for i, c in enumerate(self.collabs)}
+        # Agenda illisible (None) : collaborateur considéré comme entièrement occupé
+        self.free = np.array([
+            grid.work & ~grid.busy_mask(busy_by_calendar[_calendar_id(c)])
+            if busy_by_calendar.get(_calendar_id(c)) is not None else np.zeros(len(grid), dtype=bool)
+            for c in self.collabs
+        ])
+        # Charge : minutes ouvrées déjà occupées sur l'horizon, plus les RDV de ce passage
+        self.load = (grid.work & ~self.free).sum(axis=1) * grid.slot_min
+        self.booked = np.zeros(len(self.collabs), dtype=int)
+        self._window = BALANCE_WINDOW_MIN // grid.slot_min
+        self._lock = threading.Lock()
+
+    def assign(self, prospects):
+        """Réserve le créneau le plus tôt pour tout un paquet de prospects.
+
+        Renvoie une liste alignée sur `prospects` : (collaborateur, (début, fin)),
+        None sans créneau commun, ou l'erreur si les disponibilités sont illisibles.
+        """
+        masks = np.zeros((len(prospects), len(self.grid)), dtype=bool)
+        results = [None] * len(prospects)
+        for i, prospect in enumerate(prospects):
+            try:
+                masks[i] = self.grid.availability(prospect["Jours disponibles"], prospect["Plages horaires"])
+            except ValueError as e:
+                results[i] = e
+
+        with self._lock:
+            # Premier créneau commun de chaque (prospect, collaborateur), en une passe
+            mutual = masks[:, None, :] & self.free[None, :, :]
+            found = mutual.any(axis=2)
+            first = mutual.argmax(axis=2)
+
+            for i in range(len(prospects)):
+                if not found[i].any():
+                    continue
+                # Créneau pris entre-temps par un prospect du même paquet : recalcul ciblé
+                for c in np.flatnonzero(found[i] & ~self.free[np.arange(len(self.collabs)), first[i]]):
+                    row = masks[i] & self.free[c]
+                    found[i, c] = row.any()
+                    first[i, c] = row.argmax()
+                candidates = np.flatnonzero(found[i])
+                if not len(candidates):
+                    continue
+
+                earliest = first[i, candidates].min()
+                close = candidates[first[i, candidates] <= earliest + self._window]
+                c = min(close, key=lambda k: (self.load[k], first[i, k]))
+                slot = first[i, c]
+
+                self.free[c, slot] = False
+                self.load[c] += self.grid.slot_min
+                self.booked[c] += 1
+                results[i] = (self.collabs[c], self.grid.slot_bounds(slot))
+
+        return results
+
+    def release(self, collab, slot):
+        # Annule une réservation faite avec assign()
+        c = self._index[collab['email']]
+        with self._lock:
+            self.free[c, self.grid.slot_index(slot[0])] = True
+            self.load[c] -= self.grid.slot_min
+            self.booked[c] -= 1
 
-def next_slot(start_dt):
-    start_dt += timedelta(minutes=DUREE_APPEL_MIN)
 
-    if start_dt.hour == 12:
-        start_dt = start_dt.replace(hour=13, minute=0)
+# ==============================
+# TRAITEMENT D'UN PROSPECT
+# ==============================
+# Les créneaux sont réservés par paquet dans Planning.assign() (thread principal) ;
+# les appels réseau de chaque prospect restent parallèles.
+def process_prospect(prospect, booking, planning, calendar_service, drive_service):
+    prenom = prospect["Prénom"] or "Client"
+    nom = prospect["Nom"] or ""
+    email = prospect["Email"] or ""
+
+    # Sans créneau, rien n'est créé : le prospect sera repris au prochain passage
+    if booking is None:
+        log(f"Aucun créneau libre sous {HORIZON_JOURS} jours pour {prenom} {nom}")
+        return False
+    collab, (start_dt, end_dt) = booking
+
+    # --- 1) Création du RDV ---
+    event = {
+        'summary': f"RDV avec {prenom} {nom}",
+        'description': f"Email: {email}",
+        'start': {'dateTime': start_dt.isoformat(), 'timeZone': TIMEZONE},
+        'end': {'dateTime': end_dt.isoformat(), 'timeZone': TIMEZONE},
+        'attendees': [{'email': email}, {'email': collab['email']}]
+    }
 
-    if start_dt.hour >= 19:
-        start_dt = start_dt + timedelta(days=1)
-        start_dt = start_dt.replace(hour=10, minute=0)
+    try:
+        with metrics.stage('event_insert'):
+            quota.execute(calendar_service.events().insert(
+                calendarId='primary',
+                body=event,
+                sendUpdates='all'
+            ))
+    except Exception:
+        planning.release(*booking)
+        raise
 
-    return start_dt
+    # Le RDV existe : une erreur dans les étapes suivantes ne doit pas faire reprendre
+    # le prospect (second RDV au prochain passage), elle est seulement journalisée.
 
+    # --- 2) Demande de documents au nom du collaborateur réservé ---
+    try:
+        with metrics.stage('documents_email'):
+            send_documents_request_email(collab, prenom, nom, email)
+    except Exception as e:
+        log(f"Demande de documents non mise en file pour {prenom} {nom} (à renvoyer depuis l'app) : {e}")
 
-def parse_time_range(range_str):
+    # --- 3) Dossier Drive : une seule fois, le prospect étant ensuite marqué traité ---
     try:
-        start_str, end_str = range_str.split('-')
-        start_time = datetime.strptime(start_str.strip(), "%H:%M").time()
-        end_time = datetime.strptime(end_str.strip(), "%H:%M").time()
-        return start_time, end_time
-    except:
-        return dtime(10, 0), dtime(10, 30)
+        with metrics.stage('drive_folder'):
+            create_drive_folder(prenom, nom, drive_service)
+    except Exception as e:
+        log(f"Dossier Drive non créé pour {prenom} {nom} (à créer manuellement) : {e}")
+
+    log(f"RDV créé pour {prenom} {nom} avec {collab['prenom']} {collab['nom']}")
+    return True
 
 
 # ==============================
-# MAIN
+# POINT D'ENTRÉE (appelable depuis app.py / main.py)
 # ==============================
-def main():
-    global gmail_service, drive_service
-
+def run():
+    api_before = quota.stats()
     calendar_service = get_calendar_service()
     gmail_service = get_gmail_service()
-    drive_service = get_drive_service()  # <-- AJOUT DRIVE
-
-    print("Services Google Calendar + Gmail + Drive OK")
-
-    if not os.path.exists(EXCEL_FILE):
-        print(f"⚠️ Fichier {EXCEL_FILE} introuvable. Création d'un fichier vide.")
-        # On crée un DataFrame avec les colonnes attendues (ajustez selon vos besoins)
-        df_vide = pd.DataFrame(columns=[
-            "Prénom", "Nom", "Email", "Téléphone", "Adresse", "Ville", "Code postal", "Département", "Bien recherché", "Budget",
-            "Financement", "Délai", "Secteur", "Programme neuf", "Jour disponible", "Plage horaire", "Date d'entrée"
-        ])
-        # On le sauvegarde pour créer le fichier physique
-        df_vide.to_excel(EXCEL_FILE, index=False)
-
-    # Maintenant on peut charger le fichier sans erreur
-    wb = openpyxl.load_workbook(EXCEL_FILE)
-    ws = wb.active
-
-    headers = [cell.value for cell in ws[1]]
-
-    if "Traité" not in headers:
-        ws.cell(row=1, column=len(headers)+1, value="Traité")
-        headers.append("Traité")
-
-    traited_col_idx = headers.index("Traité") + 1
-
-    for i, row in enumerate(ws.iter_rows(min_row=2, values_only=False), start=2):
-
-        if row[traited_col_idx-1].value == "✔️":
-            continue
-
-        prenom = row[headers.index("Prénom")].value or "Client"
-        nom = row[headers.index("Nom")].value or ""
-        email = row[headers.index("Email")].value or ""
-        plages_horaire = row[headers.index("Plages horaires")].value or "10:00-10:30"
-
-        collab = random.choice(collaborateurs)
-
-        # --- 1) Envoi de la demande de documents ---
-        send_documents_request_email(collab, prenom, nom, email)
-
-        # --- 2) Création automatique du dossier Drive ---
-        create_drive_folder(prenom, nom)
-
-        # --- 3) Gestion du RDV ---
-        for ph in plages_horaire.split(','):
-            start_t, end_t = parse_time_range(ph)
-
-            start_dt = datetime.combine(
-                datetime.now().date() + timedelta(days=1), start_t
-            )
-            end_dt = datetime.combine(
-                datetime.now().date() + timedelta(days=1), end_t
-            )
-
-            while not is_slot_free(calendar_service, start_dt, end_dt):
-                start_dt = next_slot(start_dt)
-                end_dt = start_dt + timedelta(minutes=DUREE_APPEL_MIN)
-
-            event = {
-                'summary': f"RDV avec {prenom} {nom}",
-                'description': f"Email: {email}",
-                'start': {'dateTime': start_dt.isoformat(), 'timeZone': TIMEZONE},
-                'end': {'dateTime': end_dt.isoformat(), 'timeZone': TIMEZONE},
-                'attendees': [{'email': email}, {'email': collab['email']}]
-            }
-
-            calendar_service.events().insert(
-                calendarId='primary',
-                body=event,
-                sendUpdates='all'
-            ).execute()
-
-            print(f"RDV créé pour {prenom} {nom}")
+    drive_service = get_drive_service()
+
+    log("Services Google Calendar + Gmail + Drive OK")
+
+    # --- Agenda occupé de tous les collaborateurs sur l'horizon, en une seule requête ---
+    first_day = datetime.now(TZ).date() + timedelta(days=1)
+    horizon_start = datetime.combine(first_day, dtime(0, 0), tzinfo=TZ)
+    horizon_end = horizon_start + timedelta(days=HORIZON_JOURS)
+    with metrics.stage('freebusy'):
+        busy = load_busy_intervals(calendar_service, horizon_start, horizon_end,
+                                   calendar_ids=[_calendar_id(c) for c in collaborateurs])
+    grid = SlotGrid(first_day, HORIZON_JOURS, TZ, slot_min=DUREE_APPEL_MIN)
+    planning = Planning(collaborateurs, busy, grid)
+
+    conn = prospect_store.connect()
+    total = prospect_store.pending_count(conn)
+
+    booked_count = 0
+    no_slot = 0
+    failures = [
+        {'email': c['email'], 'error': "agenda illisible : aucun RDV attribué à ce collaborateur"}
+        for c in collaborateurs if busy[_calendar_id(c)] is None
+    ]
+    unreadable = len(failures)
+    done = 0
+
+    # Lecture en flux : un paquet de prospects non traités à la fois, jamais tout l'historique
+    pending = prospect_store.iter_pending(conn)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while True:
+            with metrics.stage('load_pending'):
+                chunk = next(pending, None)
+            if chunk is None:
+                break
+
+            with metrics.stage('slot_search'):
+                bookings = planning.assign(chunk)
+
+            futures = {}
+            for prospect, booking in zip(chunk, bookings):
+                if isinstance(booking, ValueError):
+                    # Pas de plage par défaut : le prospect reste à traiter, l'erreur est remontée
+                    done += 1
+                    log(f"Disponibilités illisibles pour {prospect['Prénom']} {prospect['Nom']} : {booking}")
+                    failures.append({'id': prospect['id'], 'email': prospect['Email'], 'error': str(booking)})
+                    continue
+                futures[jobs.submit(
+                    executor, process_prospect, prospect, booking, planning, calendar_service, drive_service
+                )] = prospect
+
+            # Seules les lignes réservées sont réécrites, chacune dès que son prospect est traité
+            for future in as_completed(futures):
+                prospect = futures[future]
+                done += 1
+                jobs.progress(done, total)
+                try:
+                    booked = future.result()
+                except Exception as e:
+                    log(f"Erreur pour {prospect['Prénom']} {prospect['Nom']} : {e}")
+                    failures.append({'id': prospect['id'], 'email': prospect['Email'], 'error': str(e)})
+                    continue
+                if booked:
+                    with metrics.stage('store_update'):
+                        prospect_store.mark_treated(conn, prospect["id"])
+                    booked_count += 1
+                else:
+                    no_slot += 1
+
+    conn.close()
+    log("Répartition des RDV : " + ", ".join(
+        f"{c['prenom']} {c['nom']} {n}" for c, n in zip(collaborateurs, planning.booked)
+    ))
+
+    # --- Envoi des demandes de documents mises en outbox ---
+    with metrics.stage('outbox_drain'):
+        sent = outbox.drain(gmail_service)
+    failures.extend(sent['failures'])
+    log("Tout est terminé.")
+
+    return {
+        'counts': {
+            'prospects': done,
+            'rdv': booked_count,
+            'sans_creneau': no_slot,
+            'emails_envoyes': sent['counts']['envoyes'],
+            'agendas_illisibles': unreadable,
+        },
+        'failures': failures,
+        'api': quota.stats_since(api_before),
+    }
 
-            ws.cell(row=i, column=traited_col_idx, value="✔️")
-            break
 
-    wb.save(EXCEL_FILE)
-    wb.close()
-    print("Tout est terminé.")
+# ==============================
+# MAIN
+# ==============================
+def main():
+    run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import os
+import json
+import threading
+import urllib.request
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build_from_document
+
+import transport
+
+# ----------------------------------------------------------
+# 🔌 Fabrique partagée des clients Google
+# ----------------------------------------------------------
+# - identifiants chargés (et rafraîchis) une seule fois par fichier token
+# - documents de découverte lus depuis un cache local et parsés une seule fois
+# - clients construits une fois par processus, sur le transport partagé
+#   (pool de connexions, utilisable depuis plusieurs threads)
+CREDENTIALS_FILE = "credentials.json"
+DISCOVERY_CACHE_DIR = ".discovery_cache"
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest"
+
+_lock = threading.Lock()
+_credentials = {}
+_documents = {}
+_services = {}
+
+
+# --- Identifiants ---
+def get_credentials(token_file, scopes, interactive=True):
+    key = (token_file, tuple(scopes))
+
+    with _lock:
+        creds = _credentials.get(key)
+        if creds is not None and creds.valid:
+            return creds
+
+        if creds is None and os.path.exists(token_file):
+            creds = Credentials.from_authorized_user_file(token_file, scopes)
+
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            elif interactive:
+                flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, scopes)
+                creds = flow.run_local_server(port=0)
+            else:
+                raise FileNotFoundError(f"Token {token_file} absent ou invalide.")
+
+            with open(token_file, 'w', encoding="utf-8") as token:
+                token.write(creds.to_json())
+
+        _credentials[key] = creds
+        return creds
+
+
+# --- Documents de découverte ---
+def _fetch_document(api, version):
+    # Documents embarqués par google-api-python-client (>= 2.0), sinon réseau
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc(api, version)
+    except ImportError:
+        content = None
+
+    if content is None:
+        with urllib.request.urlopen(DISCOVERY_URL.format(api=api, version=version)) as response:
+            content = response.read().decode("utf-8")
+
+    return content
+
+
+def get_discovery_document(api, version):
+    key = (api, version)
+
+    with _lock:
+        document = _documents.get(key)
+        if document is not None:
+            return document
+
+        path = os.path.join(DISCOVERY_CACHE_DIR, f"{api}.{version}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+        else:
+            content = _fetch_document(api, version)
+            os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        document = json.loads(content)
+        _documents[key] = document
+        return document
+
+
+# --- Clients ---
+def get_service(api, version, token_file, scopes, interactive=True):
+    key = (api, version, token_file, tuple(scopes))
+
+    with _lock:
+        service = _services.get(key)
+    if service is not None:
+        return service
+
+    service = build_from_document(
+        get_discovery_document(api, version),
+        http=transport.authorized_http(get_credentials(token_file, scopes, interactive=interactive))
+    )
+    with _lock:
+        return _services.setdefault(key, service)
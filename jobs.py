@@ -0,0 +1,223 @@
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+
+import locks
+import metrics
+import prospect_store
+
+# ----------------------------------------------------------
+# ⚙️ Exécution des traitements dans le processus (thread de fond)
+# ----------------------------------------------------------
+# Les modules appellent log() / progress() : dans un job, les messages sont
+# stockés et lus en direct par l'interface ; hors job, ils sont affichés.
+MAX_LOG_LINES = 2000
+MAX_JOBS = 50
+
+# Historique partagé entre processus (app.py, worker.py) dans prospects.db
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    result TEXT,
+    error TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_runs_started ON job_runs(started_at);
+"""
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+_lock = threading.Lock()
+_jobs = {}
+
+
+class Job:
+    def __init__(self, name, source="app"):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.source = source
+        self.status = "pending"   # pending → running → done | failed | skipped
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.metrics = None
+        self._logs = deque(maxlen=MAX_LOG_LINES)
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    @property
+    def running(self):
+        return self.status in ("pending", "running")
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def log(self, message):
+        with self._lock:
+            self._logs.append(f"{time.strftime('%H:%M:%S')} {message}")
+
+    def logs(self):
+        with self._lock:
+            return list(self._logs)
+
+    def set_progress(self, done, total):
+        with self._lock:
+            self.done, self.total = done, total
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+
+# --- Journalisation utilisable depuis agent2 / date ---
+def log(message):
+    job = _current_job.get()
+    if job is None:
+        print(message)
+    else:
+        job.log(message)
+
+
+# Messages de prospect_store (journal de repli, fusion) : dans le journal du job courant
+prospect_store.log = log
+
+
+def progress(done, total):
+    job = _current_job.get()
+    if job is not None:
+        job.set_progress(done, total)
+
+
+def submit(executor, func, *args):
+    """executor.submit() qui propage le job courant au thread du pool."""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+# --- Historique ---
+def _connect_history():
+    conn = prospect_store.connect()
+    conn.executescript(HISTORY_SCHEMA)
+    # Bases créées avant l'ajout de la colonne metrics
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(job_runs)")}
+    if 'metrics' not in columns:
+        conn.execute("ALTER TABLE job_runs ADD COLUMN metrics TEXT")
+    return conn
+
+
+def _record(job):
+    conn = _connect_history()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_runs "
+                "(id, name, source, status, started_at, finished_at, duration, result, error, metrics) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.name, job.source, job.status, job.started_at, job.finished_at,
+                 job.duration, json.dumps(job.result, default=str, ensure_ascii=False), job.error,
+                 json.dumps(job.metrics, ensure_ascii=False))
+            )
+    finally:
+        conn.close()
+
+
+def history(limit=20, name=None):
+    conn = _connect_history()
+    try:
+        query = "SELECT * FROM job_runs"
+        params = []
+        if name:
+            query += " WHERE name = ?"
+            params.append(name)
+        rows = conn.execute(query + " ORDER BY started_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [
+            dict(row, result=json.loads(row['result'] or 'null'), metrics=json.loads(row['metrics'] or 'null'))
+            for row in rows
+        ]
+    finally:
+        conn.close()
+
+
+# --- Lancement ---
+def _run(job, target, kwargs):
+    _current_job.set(job)
+    job.started_at = time.time()
+
+    # Un même traitement ne tourne jamais deux fois en parallèle, même
+    # lancé depuis deux processus (app.py et worker.py)
+    lock = locks.FileLock(f"job-{job.name}")
+    if not lock.acquire(blocking=False):
+        job.log("Déjà en cours dans un autre processus : lancement ignoré.")
+        job.status = "skipped"
+        job.finished_at = time.time()
+        job._finished.set()
+        return
+
+    job.status = "running"
+    try:
+        with metrics.collect_run() as run_metrics:
+            job.metrics = run_metrics
+            job.result = target(**kwargs)
+        job.status = "done"
+    except Exception as e:
+        job.error = f"{type(e).__name__}: {e}"
+        job.log(f"Erreur : {job.error}")
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+        lock.release()
+        try:
+            metrics.observe('fortal_stage_seconds', job.duration, stage=f"job.{job.name}")
+            metrics.write_textfile(job.source)
+            _record(job)
+        except Exception as e:
+            job.log(f"Historique / métriques non enregistrés : {e}")
+        job._finished.set()
+
+
+def start_job(name, target, source="app", **kwargs):
+    """Lance target(**kwargs) dans un thread ; un seul job actif par nom."""
+    with _lock:
+        for job in _jobs.values():
+            if job.name == name and job.running:
+                return job
+
+        job = Job(name, source=source)
+        _jobs[job.id] = job
+
+        # On oublie les jobs terminés les plus anciens
+        finished = [j for j in _jobs.values() if not j.running]
+        for old in sorted(finished, key=lambda j: j.created_at)[:max(0, len(_jobs) - MAX_JOBS)]:
+            del _jobs[old.id]
+
+    thread = threading.Thread(
+        target=contextvars.Context().run,
+        args=(_run, job, target, kwargs),
+        name=f"job-{name}",
+        daemon=True
+    )
+    thread.start()
+    return job
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs():
+    with _lock:
+        return sorted(_jobs.values(), key=lambda j: j.created_at, reverse=True)
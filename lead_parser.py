@@ -0,0 +1,158 @@
+import re
+import base64
+import codecs
+import datetime
+from html.parser import HTMLParser
+
+# ----------------------------------------------------------
+# 📝 Extraction des champs d'un email prospect
+# ----------------------------------------------------------
+# (clé dans l'Excel, libellé dans l'email) — l'ordre définit l'ordre des colonnes
+LEAD_FIELDS = (
+    ('Prénom', 'Prénom'),
+    ('Nom', 'Nom'),
+    ('Email', 'Email'),
+    ('Téléphone', 'Téléphone'),
+    ('Adresse', 'Adresse'),
+    ('Ville', 'Ville'),
+    ('Code postal', 'Code postal'),
+    ('Département', 'Département'),
+    ('Bien recherché', 'Bien recherché'),
+    ('Budget', "Budget d'achat"),
+    ('Financement', 'A un dossier de financement'),
+    ('Délai', "Délai d'achat"),
+    ('Secteurs', 'Secteurs de recherche'),
+    ('Programme neuf', 'Est intéressé par du programme neuf'),
+    ('Jours disponibles', 'Jours disponibles'),
+    ('Plages horaires', 'Plages horaires'),
+)
+
+FIELD_KEYS = tuple(key for key, _ in LEAD_FIELDS)
+_LABEL_TO_KEY = {label.lower(): key for key, label in LEAD_FIELDS}
+
+# Un seul motif compilé : libellé en début de ligne (puces tolérées),
+# séparateur optionnel (espaces insécables compris), valeur jusqu'à la fin de la ligne.
+# Les libellés les plus longs sont essayés en premier et \b empêche
+# "Nom" de matcher "Nombre" ou la fin de "Prénom".
+_LINE_RE = re.compile(
+    r'^[ \t>*•-]*('
+    + '|'.join(re.escape(label) for label in sorted(_LABEL_TO_KEY, key=len, reverse=True))
+    + r')\b[^\S\n]*[:=]?[^\S\n]*(.*)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def extract_info(email_body):
+    info = dict.fromkeys(FIELD_KEYS, '')
+    found = set()
+
+    # Un seul parcours du corps ; la première occurrence d'un libellé l'emporte
+    for match in _LINE_RE.finditer(email_body):
+        key = _LABEL_TO_KEY[match.group(1).lower()]
+        if key not in found:
+            found.add(key)
+            info[key] = match.group(2).rstrip()
+
+    info['Date_Entree'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return info
+
+
+# ----------------------------------------------------------
+# ✉️ Corps de l'email (payload Gmail format='full')
+# ----------------------------------------------------------
+# Seule la partie retenue est décodée, et au plus MAX_BODY_CHARS caractères
+# base64 : les champs prospect sont en tête de message.
+MAX_BODY_CHARS = 256 * 1024  # multiple de 4
+_CHARSET_RE = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+_BLOCK_TAGS = {'br', 'p', 'div', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+def _header(part, name):
+    for h in part.get('headers', []):
+        if h['name'].lower() == name:
+            return h['value']
+    return ''
+
+
+def _is_attachment(part):
+    return bool(part.get('filename')) \
+        or 'attachmentId' in part.get('body', {}) \
+        or _header(part, 'content-disposition').lower().startswith('attachment')
+
+
+def find_body_part(payload):
+    """Première partie text/plain (parcours en profondeur), sinon text/html."""
+    html_part = None
+    stack = [payload]
+
+    while stack:
+        part = stack.pop()
+        mime_type = part.get('mimeType', '')
+        if mime_type.startswith('multipart/'):
+            stack.extend(reversed(part.get('parts', [])))
+        elif _is_attachment(part):
+            continue
+        elif mime_type == 'text/plain':
+            return part
+        elif mime_type == 'text/html' and html_part is None:
+            html_part = part
+
+    return html_part
+
+
+def _charset(part):
+    match = _CHARSET_RE.search(_header(part, 'content-type'))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def _decode_part(part):
+    data = part.get('body', {}).get('data', '')[:MAX_BODY_CHARS]
+    raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+    return raw.decode(_charset(part), errors='replace')
+
+
+class _HTMLText(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.chunks.append(data)
+
+
+def html_to_text(html):
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.chunks)
+
+
+def extract_body(payload):
+    """Renvoie (texte, partie utilisée) ; ('', None) si aucune partie texte."""
+    part = find_body_part(payload)
+    if part is None:
+        return '', None
+
+    text = _decode_part(part)
+    if part.get('mimeType') == 'text/html':
+        text = html_to_text(text)
+    return text, part
@@ -1,9 +1,10 @@
-import subprocess
+import agent2
+import date
 
-print(" Lancement du script de récupération d'emails...")
-subprocess.run(["python", "agent2.py"])
+print(" Lancement de la récupération d'emails...")
+agent2.main()
 
-print(" Lancement du script de date...")
-subprocess.run(["python", "date.py"])
+print(" Lancement de la prise de RDV...")
+date.main()
 
-print(" Tous les scripts ont été exécutés !")
+print(" Tous les traitements ont été exécutés !")
@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ----------------------------------------------------------
+# 📈 Instrumentation : étapes, appels API, export Prometheus
+# ----------------------------------------------------------
+# - registre du processus (cumulatif), écrit au format texte Prometheus dans
+#   METRICS_DIR/<origine>.prom (lisible par le textfile collector)
+# - résumé par exécution (collect_run) enregistré avec l'historique des jobs
+METRICS_DIR = "metrics"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    'fortal_stage_seconds': ('histogram', "Durée des étapes de traitement."),
+    'fortal_api_call_seconds': ('histogram', "Latence des appels aux API Google."),
+    'fortal_api_calls_total': ('counter', "Appels aux API Google par méthode et statut."),
+    'fortal_events_total': ('counter', "Événements comptés (sondes de créneau, emails ignorés...)."),
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (nom, labels) -> [compteurs par bucket, somme, total]
+_counters = {}    # (nom, labels) -> valeur
+_run_metrics = contextvars.ContextVar('run_metrics', default=None)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist[0][i] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# --- Résumé de l'exécution courante (job) ---
+@contextmanager
+def collect_run():
+    run = {'stages': {}, 'calls': {}, 'api_seconds': 0.0, 'events': {}, '_lock': threading.Lock()}
+    token = _run_metrics.set(run)
+    try:
+        yield run
+    finally:
+        _run_metrics.reset(token)
+        del run['_lock']
+
+
+def _add_to_run(section, key, value):
+    run = _run_metrics.get()
+    if run is None:
+        return
+    with run['_lock']:
+        run[section][key] = run[section].get(key, 0) + value
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('fortal_stage_seconds', elapsed, stage=name)
+        _add_to_run('stages', name, elapsed)
+
+
+def count(event, value=1):
+    inc('fortal_events_total', value, event=event)
+    _add_to_run('events', event, value)
+
+
+def record_call(method, elapsed, status):
+    observe('fortal_api_call_seconds', elapsed, method=method)
+    inc('fortal_api_calls_total', method=method, status=str(status))
+    _add_to_run('calls', method, 1)
+    run = _run_metrics.get()
+    if run is not None:
+        with run['_lock']:
+            run['api_seconds'] += elapsed
+
+
+# --- Export Prometheus ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render():
+    with _lock:
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    names = sorted({name for name, _ in histograms} | {name for name, _ in counters})
+    for name in names:
+        kind, help_text = HELP.get(name, ('untyped', name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (hname, labels), (buckets, total, n) in sorted(histograms.items()):
+            if hname != name:
+                continue
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {value}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {n}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {n}")
+        for (cname, labels), value in sorted(counters.items()):
+            if cname == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(source, metrics_dir=METRICS_DIR):
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{source}.prom")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,219 @@
+import base64
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.mime.text import MIMEText
+
+import jobs
+import locks
+import prospect_store
+import quota
+from jobs import log
+
+# ----------------------------------------------------------
+# 📤 Outbox : file d'envoi persistante des emails prospects
+# ----------------------------------------------------------
+# Les emails sont d'abord enregistrés (un seul par couple prospect/modèle),
+# puis envoyés par drain() par lots, avec une concurrence bornée.
+# Statuts : pending → sending → sent | failed (re-tenté jusqu'à MAX_ATTEMPTS ;
+# au-delà, seule une nouvelle mise en file le relance)
+DRAIN_BATCH_SIZE = 50
+SEND_CONCURRENCY = 4
+MAX_ATTEMPTS = 3
+# Un seul drainer à la fois, tous processus confondus (job "date", job "documents"...)
+DRAIN_LOCK = "outbox-drain"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    prospect_key TEXT NOT NULL,
+    template TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    message_id TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT,
+    UNIQUE (prospect_key, template)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status);
+"""
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def connect():
+    conn = prospect_store.connect()
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def build_raw(sender, to, subject, body_text):
+    msg = MIMEText(body_text, "plain", "utf-8")
+    msg['To'] = to
+    msg['From'] = sender
+    msg['Subject'] = subject
+    return base64.urlsafe_b64encode(msg.as_bytes()).decode()
+
+
+# --- Mise en file ---
+def enqueue(prospect_key, template, sender, recipient, subject, body):
+    """True si l'email est ajouté (ou relancé après échec), False s'il est déjà en file ou envoyé."""
+    return enqueue_many([(prospect_key, template, sender, recipient, subject, body)])[0]
+
+
+def enqueue_many(messages):
+    """Met en file plusieurs (prospect_key, template, sender, recipient, subject, body)
+    en une transaction ; un booléen par message (False = déjà en file ou envoyé).
+
+    Un message en échec est remis en file avec un nouveau compteur de tentatives.
+    """
+    conn = connect()
+    try:
+        added = []
+        with conn:
+            for prospect_key, template, sender, recipient, subject, body in messages:
+                cursor = conn.execute(
+                    "INSERT INTO outbox "
+                    "(prospect_key, template, sender, recipient, subject, body, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (prospect_key, template) DO UPDATE SET "
+                    "status = 'pending', attempts = 0, sender = excluded.sender, "
+                    "recipient = excluded.recipient, subject = excluded.subject, body = excluded.body "
+                    "WHERE outbox.status = 'failed'",
+                    (prospect_key.strip().lower(), template, sender, recipient, subject, body, _now())
+                )
+                added.append(cursor.rowcount == 1)
+        return added
+    finally:
+        conn.close()
+
+
+def status_for(prospect_keys, template):
+    """{prospect_key: {status, attempts, last_error, sent_at}} pour les clés déjà dans l'outbox."""
+    keys = [k.strip().lower() for k in prospect_keys]
+    if not keys:
+        return {}
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT prospect_key, status, attempts, last_error, sent_at FROM outbox WHERE template = ? "
+            f"AND prospect_key IN ({', '.join('?' * len(keys))})",
+            [template, *keys]
+        ).fetchall()
+        return {row['prospect_key']: dict(row) for row in rows}
+    finally:
+        conn.close()
+
+
+# --- Envoi ---
+def _claim(conn, limit, after_id):
+    # BEGIN IMMEDIATE : deux drainers ne peuvent pas réserver les mêmes lignes
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT * FROM outbox WHERE id > ? AND (status = 'pending' "
+            "OR (status = 'failed' AND attempts < ?)) ORDER BY id LIMIT ?",
+            (after_id, MAX_ATTEMPTS, limit)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET status = 'sending', attempts = attempts + 1 WHERE id = ?",
+            [(row['id'],) for row in rows]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return rows
+
+
+def _send(service, row):
+    result = quota.execute(service.users().messages().send(
+        userId="me",
+        body={'raw': build_raw(row['sender'], row['recipient'], row['subject'], row['body'])}
+    ))
+    return result.get('id')
+
+
+def drain_running():
+    """True si un drain tient le verrou (ce processus ou un autre : job "date", worker...)."""
+    lock = locks.FileLock(DRAIN_LOCK)
+    if not lock.acquire(blocking=False):
+        return True
+    lock.release()
+    return False
+
+
+def drain(service, batch_size=DRAIN_BATCH_SIZE, concurrency=SEND_CONCURRENCY):
+    lock = locks.FileLock(DRAIN_LOCK)
+    if not lock.acquire(blocking=False):
+        log("Envoi de l'outbox déjà en cours ailleurs : attente de la fin...")
+        lock.acquire()
+    try:
+        return _drain(service, batch_size, concurrency)
+    finally:
+        lock.release()
+
+
+def _drain(service, batch_size, concurrency):
+    conn = connect()
+    conn.isolation_level = None  # transactions gérées explicitement dans _claim
+
+    # Sous le verrou, une ligne 'sending' ne peut venir que d'un envoi interrompu (crash) :
+    # elle est repassée en échec pour être re-tentée
+    conn.execute(
+        "UPDATE outbox SET status = 'failed', last_error = 'envoi interrompu' WHERE status = 'sending'"
+    )
+
+    sent = 0
+    failures = []
+    last_id = 0  # chaque ligne n'est tentée qu'une fois par passage
+    done = 0
+    total = conn.execute(
+        "SELECT COUNT(*) FROM outbox WHERE status = 'pending' OR (status = 'failed' AND attempts < ?)",
+        (MAX_ATTEMPTS,)
+    ).fetchone()[0]
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                rows = _claim(conn, batch_size, last_id)
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+
+                futures = {jobs.submit(executor, _send, service, row): row for row in rows}
+                for future in as_completed(futures):
+                    row = futures[future]
+                    done += 1
+                    jobs.progress(done, max(total, done))  # des emails ont pu être ajoutés entre-temps
+                    try:
+                        message_id = future.result()
+                    except Exception as e:
+                        conn.execute(
+                            "UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                            (str(e), row['id'])
+                        )
+                        failures.append({'email': row['recipient'], 'error': str(e)})
+                        log(f"Échec envoi à {row['recipient']} : {e}")
+                        continue
+
+                    conn.execute(
+                        "UPDATE outbox SET status = 'sent', sent_at = ?, message_id = ?, "
+                        "last_error = NULL WHERE id = ?",
+                        (_now(), message_id, row['id'])
+                    )
+                    sent += 1
+                    log(f"Email envoyé à {row['recipient']}")
+    finally:
+        conn.close()
+
+    return {
+        'counts': {'envoyes': sent, 'echecs': len(failures)},
+        'failures': failures,
+    }
@@ -0,0 +1,660 @@
+import io
+import os
+import re
+import json
+import sqlite3
+import datetime
+import unicodedata
+
+from locks import FileLock
+
+# ----------------------------------------------------------
+# 🗄️ Base locale des prospects (SQLite)
+# ----------------------------------------------------------
+# prospects.xlsx n'est plus la base : c'est un export généré à la demande.
+# Accès concurrents (agent2, date, app, worker) :
+# - SQLite en WAL sérialise les écritures
+# - si la base reste verrouillée, l'écriture part dans un journal append-only
+#   fusionné à la prochaine écriture / connexion
+# - l'export Excel est écrit dans un fichier temporaire puis renommé, sous verrou
+DB_FILE = "prospects.db"
+EXCEL_FILE = "prospects.xlsx"
+JOURNAL_FILE = "prospects.journal.jsonl"
+PENDING_CHUNK_SIZE = 500  # prospects non traités lus par paquet (iter_pending)
+
+# Journalisation : print par défaut ; jobs y branche son log() (journal du job en cours,
+# affiché dans l'interface). Pas d'import de jobs ici : jobs importe ce module.
+log = print
+
+TREATED_MARK = "✔️"
+
+# (clé utilisée par agent2 / l'Excel, colonne SQLite)
+COLUMNS = (
+    ('Prénom', 'prenom'),
+    ('Nom', 'nom'),
+    ('Email', 'email'),
+    ('Téléphone', 'telephone'),
+    ('Adresse', 'adresse'),
+    ('Ville', 'ville'),
+    ('Code postal', 'code_postal'),
+    ('Département', 'departement'),
+    ('Bien recherché', 'bien_recherche'),
+    ('Budget', 'budget'),
+    ('Financement', 'financement'),
+    ('Délai', 'delai'),
+    ('Secteurs', 'secteurs'),
+    ('Programme neuf', 'programme_neuf'),
+    ('Jours disponibles', 'jours_disponibles'),
+    ('Plages horaires', 'plages_horaires'),
+    ('Date_Entree', 'date_entree'),
+)
+
+FIELD_KEYS = tuple(key for key, _ in COLUMNS)
+EXPORT_HEADERS = FIELD_KEYS + ('Traité',)
+
+_SQL_COLUMNS = ", ".join(col for _, col in COLUMNS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS prospects (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{col} TEXT NOT NULL DEFAULT ''" for _, col in COLUMNS)},
+    traite INTEGER NOT NULL DEFAULT 0,
+    date_traite TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prospects_email ON prospects(email);
+CREATE INDEX IF NOT EXISTS idx_prospects_traite ON prospects(traite);
+"""
+
+
+# ----------------------------------------------------------
+# 📊 Statistiques de l'entonnoir (tenues à jour par triggers)
+# ----------------------------------------------------------
+# Chaque insertion (agent2, import, journal) et chaque passage à "traité"
+# (date) met à jour des agrégats : le tableau de bord les lit en temps constant.
+UNKNOWN_LABEL = "Non renseigné"
+BUDGET_BANDS = (
+    (150_000, "< 150 k€"),
+    (250_000, "150-250 k€"),
+    (400_000, "250-400 k€"),
+    (600_000, "400-600 k€"),
+    (None, "≥ 600 k€"),
+)
+# Délai entrée -> RDV : bornes supérieures des seaux (heures), un dernier seau au-delà
+LATENCY_BUCKETS_H = (1, 4, 12, 24, 48, 72, 168, 336, 720)
+
+_BUDGET_RE = re.compile(r'(\d[\d\s.,]*)\s*(k|m)?', re.IGNORECASE)
+
+
+def budget_band(value):
+    """Tranche de budget d'un texte libre ("350 000 €", "350k€", "1,2 M€")."""
+    match = _BUDGET_RE.search(value or '')
+    if not match:
+        return UNKNOWN_LABEL
+    digits = re.sub(r'[\s.]', '', match.group(1)).replace(',', '.').rstrip('.')
+    try:
+        amount = float(digits)
+    except ValueError:
+        return UNKNOWN_LABEL
+    unit = (match.group(2) or '').lower()
+    if not unit and amount < 1_000:
+        unit = 'k'  # "Budget : 350" se lit en k€
+    amount *= {'k': 1_000, 'm': 1_000_000}.get(unit, 1)
+    for limit, label in BUDGET_BANDS:
+        if limit is None or amount < limit:
+            return label
+
+
+def _departement_sql(row):
+    # Département saisi, sinon déduit du code postal
+    return (f"COALESCE(NULLIF({row}.departement, ''), NULLIF(substr({row}.code_postal, 1, 2), ''), "
+            f"'{UNKNOWN_LABEL}')")
+
+
+def _latency_sql(row):
+    return f"((julianday({row}.date_traite) - julianday({row}.date_entree)) * 24)"
+
+
+def _latency_bucket_sql(row):
+    cases = " ".join(f"WHEN {_latency_sql(row)} <= {limit} THEN {i}" for i, limit in enumerate(LATENCY_BUCKETS_H))
+    return f"(CASE {cases} ELSE {len(LATENCY_BUCKETS_H)} END)"
+
+
+def _bump_total(name, value):
+    return (f"INSERT INTO stats_totals (name, value) VALUES ('{name}', {value}) "
+            f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;")
+
+
+def _bump_group(dimension, label_sql):
+    return (f"INSERT INTO stats_groups (dimension, label, total, traites) "
+            f"VALUES ('{dimension}', {label_sql}, 1, NEW.traite) "
+            f"ON CONFLICT(dimension, label) DO UPDATE SET "
+            f"total = total + 1, traites = traites + excluded.traites;")
+
+
+STATS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS stats_totals (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stats_groups (
+    dimension TEXT NOT NULL,
+    label TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    traites INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, label)
+);
+CREATE TABLE IF NOT EXISTS stats_latency (
+    bucket INTEGER PRIMARY KEY,
+    n INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS stats_prospect_insert AFTER INSERT ON prospects BEGIN
+    {_bump_total('total', 1)}
+    {_bump_total('traites', 'NEW.traite')}
+    {_bump_group('departement', _departement_sql('NEW'))}
+    {_bump_group('budget', 'budget_band(NEW.budget)')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_prospect_treated AFTER UPDATE OF traite ON prospects
+WHEN NEW.traite != OLD.traite BEGIN
+    {_bump_total('traites', 'NEW.traite - OLD.traite')}
+    UPDATE stats_groups SET traites = traites + NEW.traite - OLD.traite
+    WHERE (dimension = 'departement' AND label = {_departement_sql('NEW')})
+       OR (dimension = 'budget' AND label = budget_band(NEW.budget));
+END;
+
+-- Version des données prospects (clé de cache de l'app) : l'outbox, l'historique
+-- des jobs ou les statistiques, stockés dans la même base, n'y touchent pas
+CREATE TRIGGER IF NOT EXISTS stats_version_insert AFTER INSERT ON prospects BEGIN
+    {_bump_total('version', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_version_update AFTER UPDATE ON prospects BEGIN
+    {_bump_total('version', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_version_delete AFTER DELETE ON prospects BEGIN
+    {_bump_total('version', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_prospect_latency AFTER UPDATE OF traite ON prospects
+WHEN NEW.traite = 1 AND OLD.traite = 0 AND {_latency_sql('NEW')} IS NOT NULL BEGIN
+    INSERT INTO stats_latency (bucket, n) VALUES ({_latency_bucket_sql('NEW')}, 1)
+    ON CONFLICT(bucket) DO UPDATE SET n = n + 1;
+    {_bump_total('latence_n', 1)}
+    {_bump_total('latence_somme_h', _latency_sql('NEW'))}
+END;
+"""
+
+
+def rebuild_stats(conn):
+    """Recalcule tous les agrégats depuis la table prospects (base existante, réparation)."""
+    with conn:
+        conn.execute("DELETE FROM stats_totals WHERE name != 'version'")
+        conn.execute("DELETE FROM stats_groups")
+        conn.execute("DELETE FROM stats_latency")
+        conn.execute(
+            "INSERT INTO stats_totals (name, value) "
+            "SELECT 'total', COUNT(*) FROM prospects UNION ALL "
+            "SELECT 'traites', COALESCE(SUM(traite), 0) FROM prospects"
+        )
+        for dimension, label_sql in (('departement', _departement_sql('p')),
+                                     ('budget', 'budget_band(p.budget)')):
+            conn.execute(
+                f"INSERT INTO stats_groups (dimension, label, total, traites) "
+                f"SELECT '{dimension}', {label_sql}, COUNT(*), SUM(p.traite) FROM prospects p "
+                f"GROUP BY 2"
+            )
+        treated_with_dates = f"FROM prospects p WHERE p.traite = 1 AND {_latency_sql('p')} IS NOT NULL"
+        conn.execute(
+            f"INSERT INTO stats_latency (bucket, n) "
+            f"SELECT {_latency_bucket_sql('p')}, COUNT(*) {treated_with_dates} GROUP BY 1"
+        )
+        conn.execute(
+            f"INSERT INTO stats_totals (name, value) "
+            f"SELECT 'latence_n', COUNT(*) {treated_with_dates} UNION ALL "
+            f"SELECT 'latence_somme_h', COALESCE(SUM({_latency_sql('p')}), 0) {treated_with_dates}"
+        )
+
+# ----------------------------------------------------------
+# 🔎 Index de recherche (FTS5, trigrammes)
+# ----------------------------------------------------------
+# Table FTS5 sans contenu, tenue à jour par triggers : elle ne stocke que
+# l'index (nom complet, email, téléphone en chiffres, ville) et renvoie des id.
+# Les trigrammes permettent la recherche par sous-chaîne ("dup" -> "Dupont") ;
+# SQLite < 3.34 n'en dispose pas : repli sur des préfixes de mots.
+# Valeurs indexées et requête sont sans accents ("helene" -> "Hélène") : le tokenizer
+# trigram ne sait les retirer qu'à partir de SQLite 3.45.
+SEARCH_PAGE_SIZE = 50
+MIN_TRIGRAM = 3
+
+
+def search_fold(value):
+    """Texte sans accents (fonction SQL des triggers de recherche)."""
+    text = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _phone_sql(value):
+    return f"replace(replace(replace({value}, ' ', ''), '.', ''), '-', '')"
+
+
+def _search_values(row):
+    return (f"{row}.id, search_fold({row}.prenom || ' ' || {row}.nom), search_fold({row}.email), "
+            f"{_phone_sql(f'{row}.telephone')}, search_fold({row}.ville)")
+
+
+def _search_schema(tokenizer):
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS prospects_search USING fts5(
+    nom_complet, email, telephone, ville, content='', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS search_prospect_insert AFTER INSERT ON prospects BEGIN
+    INSERT INTO prospects_search (rowid, nom_complet, email, telephone, ville) VALUES ({_search_values('NEW')});
+END;
+CREATE TRIGGER IF NOT EXISTS search_prospect_delete AFTER DELETE ON prospects BEGIN
+    INSERT INTO prospects_search (prospects_search, rowid, nom_complet, email, telephone, ville)
+    VALUES ('delete', {_search_values('OLD')});
+END;
+CREATE TRIGGER IF NOT EXISTS search_prospect_update
+AFTER UPDATE OF prenom, nom, email, telephone, ville ON prospects BEGIN
+    INSERT INTO prospects_search (prospects_search, rowid, nom_complet, email, telephone, ville)
+    VALUES ('delete', {_search_values('OLD')});
+    INSERT INTO prospects_search (rowid, nom_complet, email, telephone, ville) VALUES ({_search_values('NEW')});
+END;
+"""
+
+
+def _search_tokenizer(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._trigram_probe")
+        return 'trigram'
+    except sqlite3.OperationalError:
+        return 'unicode61 remove_diacritics 2'
+
+
+def rebuild_search_index(conn):
+    with conn:
+        conn.execute("INSERT INTO prospects_search (prospects_search) VALUES ('delete-all')")
+        conn.execute(
+            f"INSERT INTO prospects_search (rowid, nom_complet, email, telephone, ville) "
+            f"SELECT {_search_values('p')} FROM prospects p"
+        )
+
+
+def _query_terms(query):
+    terms = search_fold(query).split()
+    # Numéro de téléphone saisi avec espaces / points : un seul terme en chiffres
+    digits = re.sub(r'[\s.\-]', '', query)
+    if digits.isdigit():
+        terms = [digits]
+    return terms
+
+
+def _match_expression(terms, trigram):
+    """Expression MATCH (tous les termes requis) ; None si aucun terme n'est indexable."""
+    if trigram:
+        terms = [t for t in terms if len(t) >= MIN_TRIGRAM]
+        return " AND ".join('"{}"'.format(t.replace('"', '""')) for t in terms) or None
+    terms = [t for t in terms if not (t.isdigit() and len(t) < MIN_TRIGRAM)]
+    return " AND ".join('"{}"*'.format(t.replace('"', '""')) for t in terms) or None
+
+
+def search_prospects(conn, query='', traite=None, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Page de prospects (plus récents d'abord) et nombre total de résultats.
+
+    `query` porte sur nom, prénom, email, téléphone et ville ; `traite` filtre
+    sur le statut (True / False / None = tous). Les termes trop courts pour
+    l'index sont cherchés en début de prénom / nom / email / ville, ou de
+    téléphone / code postal s'ils sont numériques ("75", "06").
+    """
+    trigram = conn.execute(
+        "SELECT sql LIKE '%trigram%' FROM sqlite_master WHERE name = 'prospects_search'"
+    ).fetchone()[0]
+
+    terms = _query_terms(query or '')
+    where, params = [], []
+    match = _match_expression(terms, trigram)
+    if match:
+        # Sous-requête : l'index plein texte est toujours consulté en premier
+        where.append("p.id IN (SELECT rowid FROM prospects_search WHERE prospects_search MATCH ?)")
+        params.append(match)
+    for term in terms:
+        if len(term) >= MIN_TRIGRAM:
+            continue
+        # Parcours de la table : colonnes brutes (search_fold par ligne serait ~20x plus lent)
+        if term.isdigit():
+            where.append("(p.telephone LIKE ? OR p.code_postal LIKE ?)")
+            params.extend([f"{term}%"] * 2)
+        elif trigram:
+            where.append("(p.prenom LIKE ? OR p.nom LIKE ? OR p.email LIKE ? OR p.ville LIKE ?)")
+            params.extend([f"{term}%"] * 4)
+    if traite is not None:
+        where.append("p.traite = ?")
+        params.append(1 if traite else 0)
+
+    clause = f"FROM prospects p {'WHERE ' + ' AND '.join(where) if where else ''}"
+    total = conn.execute(f"SELECT COUNT(*) {clause}", params).fetchone()[0]
+    rows = conn.execute(f"SELECT p.* {clause} ORDER BY p.id DESC LIMIT ? OFFSET ?", params + [limit, offset])
+    return [_row_to_dict(row) for row in rows], total
+
+# --- Connexion (crée la base et importe l'ancien Excel si besoin) ---
+_initialized = set()  # bases dont le schéma est déjà en place dans ce processus
+
+
+def _open(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # Utilisée par les triggers de statistiques : toute connexion qui écrit doit passer par ici
+    conn.create_function('budget_band', 1, budget_band, deterministic=True)
+    conn.create_function('search_fold', 1, search_fold, deterministic=True)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def connect(path=DB_FILE, excel_file=EXCEL_FILE):
+    key = os.path.abspath(path)
+    if key in _initialized and os.path.exists(path):
+        conn = _open(path)
+    else:
+        # Verrou : deux processus qui démarrent ensemble n'importent pas l'Excel deux fois
+        with FileLock("prospects-db"):
+            is_new = not os.path.exists(path)
+
+            conn = _open(path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+            has_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_totals'"
+            ).fetchone()
+            conn.executescript(STATS_SCHEMA)
+            if not has_stats and not is_new:
+                rebuild_stats(conn)
+
+            has_search = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prospects_search'"
+            ).fetchone()
+            # Index créé avant search_fold (valeurs avec accents) : triggers recréés, index reconstruit
+            stale_search = has_search and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'search_prospect_insert' AND sql LIKE '%search_fold%'"
+            ).fetchone()
+            if stale_search:
+                conn.executescript(
+                    "DROP TRIGGER IF EXISTS search_prospect_insert;"
+                    "DROP TRIGGER IF EXISTS search_prospect_delete;"
+                    "DROP TRIGGER IF EXISTS search_prospect_update;"
+                )
+            conn.executescript(_search_schema(_search_tokenizer(conn)))
+            if (not has_search and not is_new) or stale_search:
+                rebuild_search_index(conn)
+
+            if is_new and os.path.exists(excel_file):
+                imported = import_excel(conn, excel_file)
+                log(f"{imported} prospects importés depuis {excel_file}")
+        _initialized.add(key)
+
+    try:
+        merge_journal(conn)
+    except sqlite3.OperationalError:
+        pass  # base encore occupée : le journal sera fusionné plus tard
+
+    return conn
+
+
+def _to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value).strip()
+
+
+def _row_to_dict(row):
+    prospect = {key: row[col] for key, col in COLUMNS}
+    prospect['id'] = row['id']
+    prospect['Traité'] = TREATED_MARK if row['traite'] else ''
+    return prospect
+
+
+# --- Journal des écritures différées ---
+# Une ligne JSON par opération : {"op": "add", "row": [...]} ou
+# {"op": "treated", "id": ..., "date": ...}. Écrit avec fsync : une fois
+# journalisée, l'opération est considérée comme enregistrée.
+def _append_journal(entries, journal_file=JOURNAL_FILE):
+    with FileLock("prospects-journal"):
+        with open(journal_file, 'a', encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _read_journal(journal_file):
+    entries = []
+    with open(journal_file, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # dernière ligne tronquée par un arrêt brutal
+    return entries
+
+
+def merge_journal(conn, journal_file=JOURNAL_FILE):
+    """Rejoue le journal dans la base puis le supprime ; renvoie le nombre d'opérations."""
+    if not os.path.exists(journal_file):
+        return 0
+
+    with FileLock("prospects-journal"):
+        if not os.path.exists(journal_file):
+            return 0
+        entries = _read_journal(journal_file)
+        with conn:
+            _insert_rows(conn, [entry['row'] for entry in entries if entry['op'] == 'add'])
+            conn.executemany(
+                "UPDATE prospects SET traite = 1, date_traite = ? WHERE id = ?",
+                [(entry['date'], entry['id']) for entry in entries if entry['op'] == 'treated']
+            )
+        os.remove(journal_file)
+
+    log(f"{len(entries)} écritures fusionnées depuis {journal_file}")
+    return len(entries)
+
+
+# --- Écriture ---
+def _insert_rows(conn, rows):
+    conn.executemany(
+        f"INSERT INTO prospects ({_SQL_COLUMNS}) VALUES ({', '.join('?' * len(COLUMNS))})",
+        rows
+    )
+
+
+def add_prospects(conn, info_list):
+    rows = [tuple(_to_text(info.get(key)) for key in FIELD_KEYS) for info in info_list]
+    try:
+        merge_journal(conn)
+        with conn:
+            _insert_rows(conn, rows)
+    except sqlite3.OperationalError as e:
+        # Base verrouillée au-delà du timeout : rien n'est perdu, fusion au prochain passage
+        _append_journal([{'op': 'add', 'row': list(row)} for row in rows])
+        log(f"Base occupée ({e}) : {len(rows)} prospects mis en journal")
+    return len(rows)
+
+
+def mark_treated(conn, prospect_id):
+    treated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE prospects SET traite = 1, date_traite = ? WHERE id = ?",
+                (treated_at, prospect_id)
+            )
+    except sqlite3.OperationalError as e:
+        _append_journal([{'op': 'treated', 'id': prospect_id, 'date': treated_at}])
+        log(f"Base occupée ({e}) : prospect {prospect_id} marqué traité via le journal")
+
+
+# --- Lecture ---
+def iter_pending(conn, chunk_size=PENDING_CHUNK_SIZE):
+    """Prospects non traités par paquets : curseur sur l'id via l'index traite,
+    les lignes déjà traitées ne sont jamais lues et la mémoire reste bornée."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT * FROM prospects WHERE traite = 0 AND id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield [_row_to_dict(row) for row in rows]
+        last_id = rows[-1]['id']
+
+
+def pending_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM prospects WHERE traite = 0").fetchone()[0]
+
+
+def get_prospects(conn, prospect_ids):
+    if not prospect_ids:
+        return []
+    placeholders = ", ".join('?' * len(prospect_ids))
+    cursor = conn.execute(f"SELECT * FROM prospects WHERE id IN ({placeholders}) ORDER BY id", list(prospect_ids))
+    return [_row_to_dict(row) for row in cursor]
+
+
+def counts(conn):
+    totals = dict(conn.execute("SELECT name, value FROM stats_totals").fetchall())
+    return int(totals.get('total', 0)), int(totals.get('traites', 0))
+
+
+def data_version(conn):
+    """(version, total, id max) : change à chaque écriture dans la table prospects, et seulement là."""
+    totals = dict(conn.execute("SELECT name, value FROM stats_totals WHERE name IN ('version', 'total')").fetchall())
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM prospects").fetchone()[0]
+    return int(totals.get('version', 0)), int(totals.get('total', 0)), max_id
+
+
+def _percentile_bucket(histogram, total, fraction):
+    seen = 0
+    for bucket, n in enumerate(histogram):
+        seen += n
+        if seen >= fraction * total:
+            return LATENCY_BUCKETS_H[bucket] if bucket < len(LATENCY_BUCKETS_H) else None
+    return None
+
+
+def funnel_stats(conn):
+    """Agrégats précalculés : totaux, par département / tranche de budget, délai entrée -> RDV.
+
+    Les percentiles du délai sont des bornes de seau (heures) ; None = au-delà du dernier seau.
+    """
+    totals = dict(conn.execute("SELECT name, value FROM stats_totals").fetchall())
+    total, treated = int(totals.get('total', 0)), int(totals.get('traites', 0))
+
+    groups = {'departement': [], 'budget': []}
+    for row in conn.execute("SELECT dimension, label, total, traites FROM stats_groups WHERE total > 0"):
+        groups[row['dimension']].append({'label': row['label'], 'total': row['total'], 'traites': row['traites']})
+    groups['departement'].sort(key=lambda g: (-g['total'], g['label']))
+    band_order = [label for _, label in BUDGET_BANDS] + [UNKNOWN_LABEL]
+    groups['budget'].sort(key=lambda g: band_order.index(g['label']) if g['label'] in band_order else len(band_order))
+
+    histogram = [0] * (len(LATENCY_BUCKETS_H) + 1)
+    for bucket, n in conn.execute("SELECT bucket, n FROM stats_latency"):
+        histogram[bucket] = n
+    latency_n = int(totals.get('latence_n', 0))
+
+    return {
+        'total': total,
+        'traites': treated,
+        'en_attente': total - treated,
+        'par_departement': groups['departement'],
+        'par_budget': groups['budget'],
+        'latence': {
+            'n': latency_n,
+            'moyenne_h': totals.get('latence_somme_h', 0) / latency_n if latency_n else None,
+            'p50_h': _percentile_bucket(histogram, latency_n, 0.5) if latency_n else None,
+            'p90_h': _percentile_bucket(histogram, latency_n, 0.9) if latency_n else None,
+            'histogramme': histogram,
+        },
+    }
+
+
+def read_dataframe(conn):
+    import pandas as pd
+
+    df = pd.read_sql_query(
+        f"SELECT id, {_SQL_COLUMNS}, traite FROM prospects ORDER BY id", conn, index_col='id'
+    )
+    df.columns = list(EXPORT_HEADERS)
+    df['Traité'] = df['Traité'].map({1: TREATED_MARK, 0: ''})
+    return df
+
+
+# --- Import / export Excel ---
+def import_excel(conn, excel_file=EXCEL_FILE):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_file, read_only=True)
+    ws = wb.active
+    rows = ws.iter_rows(values_only=True)
+    headers = [_to_text(h) for h in next(rows, [])]
+
+    # "Date d'entrée" était utilisé par l'ancien fichier vide créé par date.py
+    aliases = {"Date d'entrée": 'Date_Entree'}
+    keys = [aliases.get(h, h) for h in headers]
+
+    records = []
+    for values in rows:
+        if not any(values):
+            continue
+        record = dict(zip(keys, values))
+        records.append((
+            *(_to_text(record.get(key)) for key in FIELD_KEYS),
+            1 if _to_text(record.get('Traité')) == TREATED_MARK else 0,
+        ))
+    wb.close()
+
+    with conn:
+        conn.executemany(
+            f"INSERT INTO prospects ({_SQL_COLUMNS}, traite) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+            records
+        )
+    return len(records)
+
+
+def write_excel(conn, target):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(EXPORT_HEADERS))
+
+    cursor = conn.execute(f"SELECT {_SQL_COLUMNS}, traite FROM prospects ORDER BY id")
+    for row in cursor:
+        values = list(row)
+        values[-1] = TREATED_MARK if values[-1] else ''
+        ws.append(values)
+
+    wb.save(target)
+
+
+def export_excel_bytes(conn):
+    buffer = io.BytesIO()
+    write_excel(conn, buffer)
+    return buffer.getvalue()
+
+
+def export_excel(conn, excel_file=EXCEL_FILE):
+    # Écriture atomique : un lecteur voit l'ancien fichier complet ou le nouveau
+    tmp_file = excel_file + ".tmp"
+    with FileLock("prospects-xlsx"):
+        write_excel(conn, tmp_file)
+        os.replace(tmp_file, excel_file)
+    log(f"Export Excel écrit dans {excel_file}")
+
+
+if __name__ == "__main__":
+    conn = connect()
+    export_excel(conn)
+    conn.close()
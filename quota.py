@@ -0,0 +1,170 @@
+import time
+import random
+import threading
+
+from googleapiclient.errors import HttpError
+
+import metrics
+
+# ----------------------------------------------------------
+# 🚦 Exécution centralisée des appels Google (quotas + reprises)
+# ----------------------------------------------------------
+# Chaque requête passe par execute() :
+# - un seau à jetons par API, dimensionné sur les quotas Google par utilisateur
+# - reprise avec backoff exponentiel « full jitter » sur 429 / 5xx / 403 de quota
+# - compteurs d'appels, de reprises et d'attentes, lisibles via stats()
+
+# Jetons par seconde et coût par méthode (unités de quota Gmail ; 1 ailleurs)
+RATE_LIMITS = {
+    'gmail': 250,     # 250 unités / utilisateur / seconde
+    'calendar': 10,   # ~600 requêtes / minute / utilisateur
+    'drive': 20,
+}
+GMAIL_COSTS = {
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.batchModify': 50,
+    'gmail.users.messages.send': 100,
+    'gmail.users.history.list': 2,
+    'gmail.users.labels.list': 1,
+    'gmail.users.labels.create': 5,
+    'gmail.users.getProfile': 1,
+}
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0   # secondes
+BACKOFF_MAX = 32.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+# Ces appels ne sont pas rejoués après une erreur réseau : la requête a pu aboutir
+NON_IDEMPOTENT = {
+    'gmail.users.messages.send',
+    'calendar.events.insert',
+    'drive.files.create',
+}
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.capacity = float(rate)  # rafale d'une seconde au plus
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """Bloque jusqu'à disponibilité ; renvoie le temps attendu (s)."""
+        cost = min(float(cost), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return waited
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_lock = threading.Lock()
+_buckets = {api: TokenBucket(rate) for api, rate in RATE_LIMITS.items()}
+_counters = {}
+
+
+def _count(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def stats():
+    with _lock:
+        return dict(_counters)
+
+
+def stats_since(before):
+    """Compteurs accumulés depuis un instantané pris avec stats()."""
+    return {k: v - before.get(k, 0) for k, v in stats().items() if v != before.get(k, 0)}
+
+
+def reset_stats():
+    with _lock:
+        _counters.clear()
+
+
+def _method_ids(request):
+    # BatchHttpRequest : chaque sous-requête compte dans le quota
+    if hasattr(request, '_requests'):
+        return [r.methodId for r in request._requests.values()] or ['batch']
+    return [getattr(request, 'methodId', None) or 'unknown']
+
+
+def _cost(method_id):
+    return GMAIL_COSTS.get(method_id, 5) if method_id.startswith('gmail.') else 1
+
+
+def _throttle(method_ids):
+    per_api = {}
+    for method_id in method_ids:
+        api = method_id.split('.')[0]
+        per_api[api] = per_api.get(api, 0) + _cost(method_id)
+
+    for api, cost in per_api.items():
+        bucket = _buckets.get(api)
+        if bucket is None:
+            continue
+        waited = bucket.acquire(cost)
+        if waited:
+            _count('throttle_waits')
+            _count('throttle_seconds', waited)
+
+
+def is_retryable(error):
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUS:
+            return True
+        return status == 403 and any(r in (error.content or b'') for r in RATE_LIMIT_REASONS)
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def backoff_delay(attempt, error=None):
+    retry_after = None
+    if isinstance(error, HttpError):
+        retry_after = error.resp.get('retry-after')
+    if retry_after and str(retry_after).isdigit():
+        return float(retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def execute(request):
+    """request.execute() avec limitation de débit et reprises."""
+    method_ids = _method_ids(request)
+    label = method_ids[0] if hasattr(request, 'methodId') else f'batch.{method_ids[0]}'
+    replay_network_errors = not NON_IDEMPOTENT.intersection(method_ids)
+
+    attempt = 0
+    while True:
+        _throttle(method_ids)
+        _count(f'calls.{label}')
+        start = time.perf_counter()
+        try:
+            result = request.execute()
+            metrics.record_call(label, time.perf_counter() - start, 'ok')
+            return result
+        except Exception as error:
+            status = error.resp.status if isinstance(error, HttpError) else type(error).__name__
+            metrics.record_call(label, time.perf_counter() - start, status)
+            network_error = not isinstance(error, HttpError)
+            if attempt >= MAX_RETRIES or not is_retryable(error) \
+                    or (network_error and not replay_network_errors):
+                _count('errors')
+                raise
+            delay = backoff_delay(attempt, error)
+            _count('retries')
+            _count('retry_seconds', delay)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from availability import SlotGrid, parse_days, parse_ranges
+
+TZ = ZoneInfo('Europe/Paris')
+LUNDI = date(2026, 10, 19)
+
+
+# ----------------------------------------------------------
+# Jours disponibles
+# ----------------------------------------------------------
+@pytest.mark.parametrize("value, expected", [
+    ("", None),
+    (None, None),
+    ("Indifférent", None),
+    ("Tous les jours", None),
+    ("N'importe quel jour", None),
+    ("Lundi", {0}),
+    ("Tous les lundis", {0}),
+    ("lundi, mercredi", {0, 2}),
+    ("du lundi au vendredi", {0, 1, 2, 3, 4}),
+    ("Mardi - Jeudi", {1, 2, 3}),
+    ("samedi-lundi", {5, 6, 0}),
+    ("En semaine", {0, 1, 2, 3, 4}),
+    ("Le week-end", {5, 6}),
+    ("Tous les jours sauf le mercredi", {0, 1, 3, 4, 5, 6}),
+    ("Semaine sauf vendredi", {0, 1, 2, 3}),
+])
+def test_parse_days(value, expected):
+    assert parse_days(value) == (None if expected is None else frozenset(expected))
+
+
+@pytest.mark.parametrize("value", ["bientôt", "12/10"])
+def test_parse_days_illisible(value):
+    with pytest.raises(ValueError):
+        parse_days(value)
+
+
+# ----------------------------------------------------------
+# Plages horaires
+# ----------------------------------------------------------
+@pytest.mark.parametrize("value, expected", [
+    ("", None),
+    ("Peu importe", None),
+    ("N'importe quand", None),
+    ("Toute la journée", None),
+    ("14h-16h", [(840, 960)]),
+    ("14:00-16:00", [(840, 960)]),
+    ("14h30 à 16h", [(870, 960)]),
+    ("9 - 12", [(540, 720)]),
+    ("Entre 14h et 16h", [(840, 960)]),
+    ("entre 9 et 11h30", [(540, 690)]),
+    ("9h-12h et 14h-18h", [(540, 720), (840, 1080)]),
+    ("18h", [(1080, 1140)]),
+    ("À partir de 17h", [(1020, 1440)]),
+    ("avant 11h", [(0, 660)]),
+    ("Le matin", [(540, 720)]),
+    ("Toute la matinée", [(540, 720)]),
+    ("Après midi", [(840, 1080)]),
+    ("En soirée", [(1080, 1200)]),
+    ("matin ou 18h-19h", [(1080, 1140), (540, 720)]),
+])
+def test_parse_ranges(value, expected):
+    assert parse_ranges(value) == (None if expected is None else tuple(expected))
+
+
+@pytest.mark.parametrize("value", ["quand vous voulez", "16h-14h", "25h"])
+def test_parse_ranges_illisible(value):
+    with pytest.raises(ValueError):
+        parse_ranges(value)
+
+
+# ----------------------------------------------------------
+# Grille de créneaux
+# ----------------------------------------------------------
+def test_availability_croise_jours_plages_et_heures_ouvrees():
+    grid = SlotGrid(LUNDI, 7, TZ)
+    mask = grid.availability("Tous les mardis", "Entre 11h et 14h")
+    starts = [grid.slot_bounds(i)[0] for i in mask.nonzero()[0]]
+    # 12h-13h : pause déjeuner des collaborateurs
+    assert starts == [
+        datetime(2026, 10, 20, 11, 0, tzinfo=TZ),
+        datetime(2026, 10, 20, 11, 30, tzinfo=TZ),
+        datetime(2026, 10, 20, 13, 0, tzinfo=TZ),
+        datetime(2026, 10, 20, 13, 30, tzinfo=TZ),
+    ]
+
+
+# ----------------------------------------------------------
+# Répartition des RDV (date.Planning)
+# ----------------------------------------------------------
+def test_planning_assign():
+    pytest.importorskip("googleapiclient")
+    from date import Planning
+
+    alice = {'prenom': 'Alice', 'nom': 'A', 'email': 'alice@example.com'}
+    bob = {'prenom': 'Bob', 'nom': 'B', 'email': 'bob@example.com'}
+    grid = SlotGrid(LUNDI, 7, TZ)
+    # Alice occupée tout le lundi matin
+    busy = {
+        alice['email']: [(datetime(2026, 10, 19, 10, tzinfo=TZ), datetime(2026, 10, 19, 12, tzinfo=TZ))],
+        bob['email']: [],
+    }
+    planning = Planning([alice, bob], busy, grid)
+
+    prospects = [
+        {'Jours disponibles': "lundi", 'Plages horaires': "10h-11h"},
+        {'Jours disponibles': "lundi", 'Plages horaires': "10h-11h"},
+        {'Jours disponibles': "lundi", 'Plages horaires': "10h-11h"},
+        {'Jours disponibles': "lundi", 'Plages horaires': "20h-21h"},  # hors heures ouvrées
+        {'Jours disponibles': "lundi", 'Plages horaires': "quand vous voulez"},
+    ]
+    results = planning.assign(prospects)
+
+    # Seul Bob est libre lundi 10h-11h : deux créneaux de 30 min, puis plus rien
+    assert results[0] == (bob, (datetime(2026, 10, 19, 10, 0, tzinfo=TZ), datetime(2026, 10, 19, 10, 30, tzinfo=TZ)))
+    assert results[1] == (bob, (datetime(2026, 10, 19, 10, 30, tzinfo=TZ), datetime(2026, 10, 19, 11, 0, tzinfo=TZ)))
+    assert results[2] is None
+    assert results[3] is None
+    assert isinstance(results[4], ValueError)
+    assert list(planning.booked) == [0, 2]
+
+    # Un RDV annulé libère le créneau pour le prospect suivant
+    planning.release(*results[0])
+    assert planning.assign(prospects[:1]) == [results[0]]
+
+
+def test_planning_agenda_illisible():
+    pytest.importorskip("googleapiclient")
+    from date import Planning
+
+    alice = {'prenom': 'Alice', 'nom': 'A', 'email': 'alice@example.com'}
+    bob = {'prenom': 'Bob', 'nom': 'B', 'email': 'bob@example.com'}
+    grid = SlotGrid(LUNDI, 7, TZ)
+    # Agenda de Bob illisible (None) : il ne doit pas passer pour libre toute la semaine
+    planning = Planning([alice, bob], {alice['email']: [], bob['email']: None}, grid)
+
+    prospects = [{'Jours disponibles': "lundi", 'Plages horaires': "10h-12h"}] * 3
+    assert [collab for collab, _ in planning.assign(prospects)] == [alice, alice, alice]
+    assert list(planning.booked) == [3, 0]
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import outbox  # noqa: E402
+
+MESSAGE = ("Marie@Example.com", "demande_documents", "collab@example.com", "marie@example.com",
+           "Sujet", "Corps")
+
+
+class FakeRequest:
+    methodId = 'gmail.users.messages.send'
+
+    def __init__(self, gmail):
+        self.gmail = gmail
+
+    def execute(self, **kwargs):
+        if self.gmail.error:
+            raise self.gmail.error
+        self.gmail.sent += 1
+        return {'id': f"sent{self.gmail.sent}"}
+
+
+class FakeGmail:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = 0
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        return FakeRequest(self)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Base, verrous et outbox neufs pour chaque test
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(outbox.quota, '_buckets', {})
+
+
+def status():
+    return outbox.status_for([MESSAGE[0]], MESSAGE[1])[MESSAGE[0].lower()]
+
+
+def test_enqueue_dedoublonne():
+    assert outbox.enqueue(*MESSAGE) is True
+    assert outbox.enqueue(*MESSAGE) is False
+    assert outbox.enqueue_many([MESSAGE, MESSAGE[:1] + ("autre_modele",) + MESSAGE[2:]]) == [False, True]
+
+    gmail = FakeGmail()
+    assert outbox.drain(gmail)['counts'] == {'envoyes': 2, 'echecs': 0}
+    # Déjà envoyé : jamais renvoyé
+    assert outbox.enqueue(*MESSAGE) is False
+    assert outbox.drain(gmail)['counts'] == {'envoyes': 0, 'echecs': 0}
+    assert gmail.sent == 2
+
+
+def test_echecs_epuises_relances_par_nouvelle_mise_en_file():
+    outbox.enqueue(*MESSAGE)
+    down = FakeGmail(error=ValueError("Gmail indisponible"))
+    for _ in range(outbox.MAX_ATTEMPTS):
+        assert outbox.drain(down)['counts'] == {'envoyes': 0, 'echecs': 1}
+    assert status()['status'] == 'failed'
+    assert status()['attempts'] == outbox.MAX_ATTEMPTS
+
+    # Tentatives épuisées : plus rien n'est tenté...
+    assert outbox.drain(down)['counts'] == {'envoyes': 0, 'echecs': 0}
+
+    # ... jusqu'à ce que le message soit remis en file
+    assert outbox.enqueue(*MESSAGE) is True
+    assert status()['status'] == 'pending'
+    assert status()['attempts'] == 0
+
+    gmail = FakeGmail()
+    assert outbox.drain(gmail)['counts'] == {'envoyes': 1, 'echecs': 0}
+    assert status()['status'] == 'sent'
+    assert outbox.enqueue(*MESSAGE) is False
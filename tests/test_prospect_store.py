@@ -0,0 +1,81 @@
+import pytest
+
+import prospect_store
+
+PROSPECTS = [
+    {'Prénom': 'Hélène', 'Nom': 'Dupré', 'Email': 'helene.dupre@example.com', 'Téléphone': '06 12 34 56 78',
+     'Ville': 'Paris', 'Code postal': '75011'},
+    {'Prénom': 'Jean', 'Nom': 'Dupont', 'Email': 'jean.dupont@example.com', 'Téléphone': '07.98.76.54.32',
+     'Ville': 'Évry', 'Code postal': '91000'},
+    {'Prénom': 'Li', 'Nom': 'Wu', 'Email': 'li.wu@example.com', 'Téléphone': '0475123456',
+     'Ville': 'Lyon', 'Code postal': '69003'},
+]
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = prospect_store.connect()
+    prospect_store.add_prospects(conn, PROSPECTS)
+    prospect_store.mark_treated(conn, 2)
+    yield conn
+    conn.close()
+
+
+def names(conn, query, traite=None):
+    rows, total = prospect_store.search_prospects(conn, query, traite)
+    assert total == len(rows)
+    return sorted(row['Prénom'] for row in rows)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", ['Hélène', 'Jean', 'Li']),
+    ("dup", ['Hélène', 'Jean']),
+    ("dupont", ['Jean']),
+    ("jean dup", ['Jean']),
+    # Accents ignorés dans les deux sens
+    ("helene", ['Hélène']),
+    ("HÉLÈNE", ['Hélène']),
+    ("evry", ['Jean']),
+    ("Évry", ['Jean']),
+    # Téléphone saisi avec ou sans séparateurs
+    ("06 12 34", ['Hélène']),
+    ("0798", ['Jean']),
+    ("56 78", ['Hélène']),
+    # Termes numériques trop courts pour l'index : début de téléphone / code postal
+    ("06", ['Hélène']),
+    ("75", ['Hélène']),
+    ("69", ['Li']),
+    ("04", ['Li']),
+    ("12", []),
+    ("dup 91", ['Jean']),
+    # Terme alphabétique court : début de prénom / nom / email / ville
+    ("li", ['Li']),
+    ("wu", ['Li']),
+    ("ly", ['Li']),
+    ("inconnu", []),
+])
+def test_search_prospects(conn, query, expected):
+    assert names(conn, query) == expected
+
+
+def test_search_prospects_filtre_traite(conn):
+    assert names(conn, "dup", traite=True) == ['Jean']
+    assert names(conn, "dup", traite=False) == ['Hélène']
+
+
+def test_search_prospects_pagination(conn):
+    rows, total = prospect_store.search_prospects(conn, "", limit=2, offset=0)
+    assert total == 3
+    assert [row['id'] for row in rows] == [3, 2]
+    rows, _ = prospect_store.search_prospects(conn, "", limit=2, offset=2)
+    assert [row['id'] for row in rows] == [1]
+
+
+def test_search_suit_les_modifications(conn):
+    with conn:
+        conn.execute("UPDATE prospects SET nom = 'Martin', email = 'jean.martin@example.com' WHERE id = 2")
+        conn.execute("DELETE FROM prospects WHERE id = 3")
+    assert names(conn, "dupont") == []
+    assert names(conn, "martin") == ['Jean']
+    assert names(conn, "lyon") == []
@@ -0,0 +1,68 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from google.auth.transport.requests import AuthorizedSession
+
+# ----------------------------------------------------------
+# 🚚 Transport HTTP partagé pour les clients Google
+# ----------------------------------------------------------
+# httplib2 (transport par défaut de googleapiclient) n'est pas thread-safe et
+# chaque client ouvre ses propres connexions. Ici, toutes les sessions
+# partagent un même pool urllib3 (keep-alive réutilisé entre Gmail, Calendar
+# et Drive) et peuvent être appelées depuis plusieurs threads.
+POOL_CONNECTIONS = 10  # nombre d'hôtes gardés en pool
+POOL_MAXSIZE = 32      # connexions keep-alive par hôte
+TIMEOUT = 60           # secondes
+
+_lock = threading.Lock()
+_adapter = None
+
+
+def shared_adapter():
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        return _adapter
+
+
+def pooled_session(credentials=None):
+    """Session (authentifiée si credentials) branchée sur le pool partagé."""
+    session = AuthorizedSession(credentials) if credentials is not None else requests.Session()
+    adapter = shared_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class HttpResponse(dict):
+    """Réponse au format httplib2.Response attendu par googleapiclient."""
+
+    def __init__(self, response):
+        super().__init__((k.lower(), v) for k, v in response.headers.items())
+        self.status = response.status_code
+        self.reason = response.reason
+        self['status'] = str(response.status_code)
+
+
+class PooledHttp:
+    """Objet `http` compatible httplib2 à passer à googleapiclient."""
+
+    def __init__(self, session, timeout=TIMEOUT):
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        response = self.session.request(
+            method, uri,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=redirections > 0
+        )
+        return HttpResponse(response), response.content
+
+
+def authorized_http(credentials, timeout=TIMEOUT):
+    return PooledHttp(pooled_session(credentials), timeout=timeout)
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+
+import agent2
+import date
+import jobs
+
+# ----------------------------------------------------------
+# 🔁 Mode démon : relève Gmail et prend les RDV en continu
+# ----------------------------------------------------------
+# À chaque cycle : agent2.run() puis date.run(). Chaque traitement est un job
+# (verrou inter-processus : jamais deux exécutions simultanées, même si
+# quelqu'un clique en parallèle dans app.py) dont l'historique est lu par l'UI.
+POLL_INTERVAL = int(os.environ.get("WORKER_POLL_INTERVAL", 60))          # secondes
+BOOKING_INTERVAL = int(os.environ.get("WORKER_BOOKING_INTERVAL", 60))    # secondes
+STATUS_FILE = "worker_status.json"
+
+
+def write_status(status):
+    tmp_file = STATUS_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_file, STATUS_FILE)
+
+
+def read_status():
+    try:
+        with open(STATUS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def run_job(name, target):
+    job = jobs.start_job(name, target, source="worker")
+    job.wait()
+    counts = (job.result or {}).get('counts', {})
+    print(f"[{time.strftime('%H:%M:%S')}] {name} : {job.status} en {job.duration:.1f} s {counts or ''}")
+    if job.error:
+        print(f"    {job.error}")
+    return job
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relève Gmail et prise de RDV en continu.")
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL,
+                        help="secondes entre deux relèves Gmail")
+    parser.add_argument("--booking-interval", type=int, default=BOOKING_INTERVAL,
+                        help="secondes entre deux prises de RDV")
+    parser.add_argument("--once", action="store_true", help="un seul cycle puis arrêt")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    schedule = [
+        ("agent2", agent2.run, args.interval),
+        ("date", date.run, args.booking_interval),
+    ]
+    next_run = {name: 0.0 for name, _, _ in schedule}
+    last_runs = {}
+    started_at = time.time()
+
+    print(f"Worker démarré (relève toutes les {args.interval} s, RDV toutes les {args.booking_interval} s)")
+
+    while not stop.is_set():
+        # Dans l'ordre : les prospects relevés sont planifiés dans le même cycle
+        for name, target, interval in schedule:
+            if stop.is_set() or time.monotonic() < next_run[name]:
+                continue
+            job = run_job(name, target)
+            next_run[name] = time.monotonic() + interval
+            last_runs[name] = {'status': job.status, 'finished_at': job.finished_at}
+
+        now = time.monotonic()
+        write_status({
+            'pid': os.getpid(),
+            'started_at': started_at,
+            'heartbeat': time.time(),
+            'interval': min(args.interval, args.booking_interval),
+            'next_runs': {name: time.time() + max(0.0, t - now) for name, t in next_run.items()},
+            'last_runs': last_runs,
+        })
+
+        if args.once:
+            break
+        stop.wait(max(0.0, min(next_run.values()) - time.monotonic()))
+
+    print("Worker arrêté.")
+
+
+if __name__ == "__main__":
+    main()